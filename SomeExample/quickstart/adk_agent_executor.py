@@ -1,6 +1,10 @@
 import asyncio
 import logging
+import os
+import time
+import uuid
 
+from collections import OrderedDict
 from collections.abc import AsyncGenerator
 from google.adk import Runner
 
@@ -13,13 +17,15 @@ from a2a.server.events.event_queue import EventQueue
 from a2a.server.tasks import TaskUpdater
 from a2a.types import (
     AgentCard,
+    Artifact,
     FilePart,
     FileWithBytes,
     FileWithUri,
     Part,
+    TaskArtifactUpdateEvent,
+    TaskNotCancelableError,
     TaskState,
     TextPart,
-    UnsupportedOperationError,
 )
 from a2a.utils.errors import ServerError
 from a2a.utils.message import new_agent_text_message
@@ -28,6 +34,61 @@ from a2a.utils.message import new_agent_text_message
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# 已结束的任务不能再取消
+TERMINAL_STATES = {
+    TaskState.completed,
+    TaskState.canceled,
+    TaskState.failed,
+    TaskState.rejected,
+}
+
+
+class SessionCache:
+    """A size-bounded LRU cache of known ADK session ids keyed by context id.
+
+    Only the session id is kept: the session service returns full copies of
+    the session, which would hold every conversation a second time outside
+    its size accounting. Events the runner appends to the session therefore
+    do not make an entry stale either. Entries expire
+    after SESSION_CACHE_TTL seconds and are invalidated when a run fails or
+    the session service drops the session.
+    """
+
+    def __init__(self, max_size: int | None = None, ttl: float | None = None):
+        self.max_size = max_size or int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_CACHE_TTL", "600"))
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context_id: str) -> str | None:
+        entry = self._entries.get(context_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._entries.pop(context_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(context_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, context_id: str, session_id: str) -> None:
+        self._entries[context_id] = (time.monotonic(), session_id)
+        self._entries.move_to_end(context_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, context_id: str) -> None:
+        self._entries.pop(context_id, None)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
 
 class ADKAgentExecutor(AgentExecutor):
     """An AgentExecutor that runs an ADK-based Agent."""
@@ -36,7 +97,10 @@ class ADKAgentExecutor(AgentExecutor):
         self.runner = runner
         self._card = card
 
-        self._running_sessions = {}
+        # task id -> 正在执行的asyncio任务，取消任务时用于中止ADK的运行
+        self._running_sessions: dict[str, asyncio.Task] = {}
+        # 多轮对话的热点会话直接命中缓存，跳过会话存储的查询
+        self._session_cache = SessionCache()
         self.run_config = run_config
 
     def _run_agent(
@@ -54,23 +118,56 @@ class ADKAgentExecutor(AgentExecutor):
         task_updater: TaskUpdater,
     ) -> None:
         # The call to self._upsert_session was returning a coroutine object,
-        # leading to an AttributeError when trying to access .id on it directly.
-        # We need to await the coroutine to get the actual session object.
-        session_obj = await self._upsert_session(
+        # so it must be awaited to get the id of the resolved session
+        # to be used in self._run_agent.
+        session_id = await self._upsert_session(
             session_id,
         )
-        # Update session_id with the ID from the resolved session object
-        # to be used in self._run_agent.
-        session_id = session_obj.id
+        try:
+            await self._run_session(session_id, new_message, task_updater)
+        except Exception:
+            # 会话可能已失效，下次请求重新查询会话存储
+            self._session_cache.invalidate(session_id)
+            raise
 
+    async def _run_session(
+        self,
+        session_id: str,
+        new_message: types.Content,
+        task_updater: TaskUpdater,
+    ) -> None:
+        artifact_id = str(uuid.uuid4())
+        # 当前这次模型输出是否已经发送过分片
+        streamed = False
         async for event in self._run_agent(session_id, new_message):
 
+            if event.partial:
+                parts = (
+                    convert_genai_parts_to_a2a(event.content.parts)
+                    if event.content and event.content.parts
+                    else []
+                )
+                if parts:
+                    logger.debug("Yielding response chunk")
+                    enqueue_artifact_chunk(
+                        task_updater, artifact_id, parts, append=streamed, last_chunk=False
+                    )
+                    streamed = True
+                continue
             if event.is_final_response():
                 parts = convert_genai_parts_to_a2a(event.content.parts)
                 logger.debug("Yielding final response: %s", parts)
-                task_updater.add_artifact(parts)
+                if streamed:
+                    # 用完整的回复替换已发送的分片，并标记为最后一个分片
+                    enqueue_artifact_chunk(
+                        task_updater, artifact_id, parts, append=False, last_chunk=True
+                    )
+                else:
+                    task_updater.add_artifact(parts)
                 task_updater.complete()
                 break
+            # 下一次模型输出的分片重新开始，覆盖之前的中间文本
+            streamed = False
             if not event.get_function_calls():
                 logger.debug("Yielding update response")
                 task_updater.update_status(
@@ -93,24 +190,47 @@ class ADKAgentExecutor(AgentExecutor):
         if not context.current_task:
             updater.submit()
         updater.start_work()
-        await self._process_request(
-            types.UserContent(
-                parts=convert_a2a_parts_to_genai(context.message.parts),
-            ),
-            context.context_id,
-            updater,
+        run_task = asyncio.create_task(
+            self._process_request(
+                types.UserContent(
+                    parts=convert_a2a_parts_to_genai(context.message.parts),
+                ),
+                context.context_id,
+                updater,
+            )
         )
+        self._running_sessions[context.task_id] = run_task
+        try:
+            await run_task
+        except asyncio.CancelledError:
+            # cancel()已经移除了该任务并发送了canceled状态，其它情况的取消继续向上抛出
+            if context.task_id in self._running_sessions:
+                run_task.cancel()
+                raise
+            logger.debug("[weather] task %s canceled", context.task_id)
+        finally:
+            self._running_sessions.pop(context.task_id, None)
         logger.debug("[weather] execute exiting")
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
-        # Ideally: kill any ongoing tasks.
-        raise ServerError(error=UnsupportedOperationError())
+        # Abort the in-flight LLM and tool calls, then report the task as canceled.
+        run_task = self._running_sessions.pop(context.task_id, None)
+        if run_task is not None:
+            run_task.cancel()
+        elif context.current_task and context.current_task.status.state in TERMINAL_STATES:
+            raise ServerError(error=TaskNotCancelableError())
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        updater.update_status(TaskState.canceled, final=True)
 
-    async def _upsert_session(self, session_id: str):
+    async def _upsert_session(self, session_id: str) -> str:
         """
-        Retrieves a session if it exists, otherwise creates a new one.
+        Retrieves a session if it exists, otherwise creates a new one, and returns its id.
         Ensures that async session service methods are properly awaited.
         """
+        cached_id = self._session_cache.get(session_id)
+        if cached_id is not None:
+            return cached_id
+        logger.debug("Session cache miss for %s: %s", session_id, self._session_cache.stats())
         session = await self.runner.session_service.get_session(
             app_name=self.runner.app_name, user_id="self", session_id=session_id
         )
@@ -124,7 +244,27 @@ class ADKAgentExecutor(AgentExecutor):
                 f"Critical error: Session is None even after create_session for session_id: {session_id}"
             )
             raise RuntimeError(f"Failed to get or create session: {session_id}")
-        return session
+        self._session_cache.put(session_id, session.id)
+        return session.id
+
+
+def enqueue_artifact_chunk(
+    task_updater: TaskUpdater,
+    artifact_id: str,
+    parts: list[Part],
+    append: bool,
+    last_chunk: bool,
+) -> None:
+    """Send parts as one chunk of a streamed artifact."""
+    task_updater.event_queue.enqueue_event(
+        TaskArtifactUpdateEvent(
+            taskId=task_updater.task_id,
+            contextId=task_updater.context_id,
+            artifact=Artifact(artifactId=artifact_id, parts=parts),
+            append=append,
+            lastChunk=last_chunk,
+        )
+    )
 
 
 def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
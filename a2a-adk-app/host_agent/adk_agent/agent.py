@@ -4,23 +4,48 @@ from typing import List
 import httpx
 from typing import Any
 import asyncio
+import concurrent.futures
 import os
+import time
 import logging
+from contextlib import aclosing
 
 from google.adk.models.lite_llm import LiteLlm
 from google.adk import Agent
 from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.tools.tool_context import ToolContext
-from .remote_agent_connection import RemoteAgentConnections, TaskUpdateCallback
-from a2a.client import A2ACardResolver
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest, LlmResponse
+from google.genai import types
+from .remote_agent_connection import (
+    RemoteAgentConnections,
+    SharedHttpxPool,
+    TaskUpdateCallback,
+    relay_task_update,
+)
+from .card_cache import AgentCardCache
+from .skill_router import SkillIndex
+from .roster_selector import RosterSelector
+from .response_cache import ResponseCache
+from .resilience import AgentUnavailableError
+from .prompt_cache import GeminiContextCache, PromptCacheStats
+from .llm_cache import create_llm_response_cache
+from .result_shaper import ResultShaper, result_text
 
+from a2a.client import A2AClientHTTPError
 from a2a.types import (
     SendMessageResponse,
     SendMessageRequest,
+    SendStreamingMessageRequest,
+    GetTaskRequest,
+    TaskQueryParams,
+    TaskState,
     MessageSendParams,
     SendMessageSuccessResponse,
+    JSONRPCErrorResponse,
     Task,
+    TaskStatusUpdateEvent,
+    TaskArtifactUpdateEvent,
     Part,
     AgentCard,
 )
@@ -64,6 +89,44 @@ def create_model(model:str, provider: str):
         raise ValueError(f"Unsupported provider: {provider}")
 
 
+def create_summary_model() -> BaseLlm | None:
+    """
+    创建用于摘要远程Agent结果的小模型，未配置ROUTING_RESULT_SUMMARY_MODEL时返回None
+    :return:
+    """
+    model = os.getenv("ROUTING_RESULT_SUMMARY_MODEL")
+    if not model:
+        return None
+    provider = os.getenv("ROUTING_RESULT_SUMMARY_PROVIDER") or os.environ.get("MODEL_PROVIDER", "google")
+    llm = create_model(model, provider)
+    if isinstance(llm, str):
+        return LLMRegistry.new_llm(llm)
+    return llm
+
+
+# 远程任务的终止状态，到达后不再轮询
+TERMINAL_TASK_STATES = {
+    TaskState.completed.value,
+    TaskState.failed.value,
+    TaskState.canceled.value,
+    TaskState.rejected.value,
+    TaskState.input_required.value,
+}
+
+
+# 响应缓存命中时，记录到会话状态中的回答的最大长度
+CACHED_ANSWER_MAX_CHARS = 2000
+
+
+def task_artifact_parts(task: Task) -> list:
+    """Returns the artifact parts of a task as JSON data."""
+    return [
+        part.model_dump(mode="json", exclude_none=True)
+        for artifact in task.artifacts or []
+        for part in artifact.parts
+    ]
+
+
 def convert_part(part: Part, tool_context: ToolContext):
     # Currently only support text parts
     if part.type == "text":
@@ -112,34 +175,194 @@ class RoutingAgent:
         task_callback: TaskUpdateCallback | None = None,
     ):
         self.task_callback = task_callback
+        # 远程Agent支持流式时，是否使用send_message_streaming进行委派
+        self.streaming = os.getenv("ROUTING_STREAMING", "true").lower() == "true"
         self.remote_agent_connections: dict[str, RemoteAgentConnections] = {}
         self.cards: dict[str, AgentCard] = {}
         self.agents: str = ""
+        # 指令中只放Agent名称，详细信息按消息挑选后追加在最后
+        self.agent_names: str = ""
+        self.card_cache = AgentCardCache()
+        # 基于AgentCard技能标签的确定性路由，命中时跳过一次路由LLM调用
+        self.fast_path = os.getenv("ROUTING_FAST_PATH", "false").lower() == "true"
+        self.skill_index = SkillIndex()
+        # 只调用了一个Agent且任务完成时，直接返回远程Agent的结果，跳过路由LLM的复述
+        self.passthrough = os.getenv("ROUTING_PASSTHROUGH", "false").lower() == "true"
+        # Agent数量较多时，只把与当前消息最相关的top-k个Agent放入指令
+        self.roster_selector = RosterSelector()
+        # 提示词缓存：统计命中的token数，google模型可选显式上下文缓存
+        self.prompt_cache_stats = PromptCacheStats()
+        self.context_cache: GeminiContextCache | None = None
+        # 可选的本地LLM响应缓存，相同的请求直接返回缓存的响应
+        self.llm_cache = create_llm_response_cache()
+        # 可选的远程Agent响应缓存
+        self.response_cache = (
+            ResponseCache()
+            if os.getenv("ROUTING_RESPONSE_CACHE", "false").lower() == "true"
+            else None
+        )
+        # 远程Agent的结果超出token预算时，摘要或截断后再交给路由LLM
+        self.result_shaper = ResultShaper(create_summary_model())
+        # 所有远程Agent共用的连接池（包括agent card的获取）
+        self.http_pool = SharedHttpxPool()
+        # 地址 -> agent card 名称，供健康检查重新探测
+        self.agent_addresses: dict[str, str] = {}
+        # 当前不可用的Agent地址，会在后台周期性重试
+        self.unavailable_addresses: set[str] = set()
+        self._health_check_task: asyncio.Task | None = None
+        # 通过send_message_async提交的远程任务的最新状态和结果，按task id索引
+        self.task_results: dict[str, dict[str, Any]] = {}
+        self._task_result_times: dict[str, float] = {}
+        # 收集异步任务结果的后台任务
+        self._poll_tasks: set[asyncio.Task] = set()
 
     # Asynchronous part of initialization
     async def _async_init_components(self, remote_agent_addresses: List[str]):
-        # 构造远程连接，并从每个地址抓取 agent 的元数据（name, description）用于后续分配。
-        async with httpx.AsyncClient(timeout=30) as client:
-            for address in remote_agent_addresses:
-                card_resolver = A2ACardResolver(client, address) # Constructor is sync
-                try:
-                    card = await card_resolver.get_agent_card() # get_agent_card is async
-                    
-                    remote_connection = RemoteAgentConnections(
-                        agent_card=card, agent_url=address
-                    )
-                    self.remote_agent_connections[card.name] = remote_connection
-                    self.cards[card.name] = card
-                except httpx.ConnectError as e:
-                    print(f"ERROR: Failed to get agent card from {address}: {e}")
-                except Exception as e: # Catch other potential errors
-                    print(f"ERROR: Failed to initialize connection for {address}: {e}")
-        
+        # 构造远程连接，并发地从每个地址抓取 agent 的元数据（name, description）用于后续分配。
+        # 所有地址共享一个总的启动截止时间，超时或失败的地址在后台重试，不阻塞其它Agent。
+        deadline = float(os.getenv("AGENT_DISCOVERY_TIMEOUT", "10"))
+        client = self.http_pool.get()
+        tasks = {
+            asyncio.create_task(self._resolve_agent(client, address)): address
+            for address in remote_agent_addresses
+        }
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+            print(f"ERROR: Timed out getting agent card from {tasks[task]} after {deadline}s")
+        for task, address in tasks.items():
+            if task in pending or not task.result():
+                self.unavailable_addresses.add(address)
+
+        self._refresh_roster()
+        self._schedule_health_check()
+
+    async def _resolve_agent(
+        self, client: httpx.AsyncClient, address: str, revalidate: bool = False
+    ) -> bool:
+        """Fetches the agent card at address and registers it as a replica.
+
+        Addresses whose cards share a name are replicas of one agent and share
+        one connection, which is kept across health probes and card changes.
+        """
+        try:
+            # 优先使用本地缓存的agent card，过期后通过ETag/Last-Modified条件请求重新验证
+            card = await self.card_cache.get_agent_card(
+                client, address, revalidate=revalidate
+            )
+        except httpx.ConnectError as e:
+            print(f"ERROR: Failed to get agent card from {address}: {e}")
+            return False
+        except Exception as e: # Catch other potential errors
+            print(f"ERROR: Failed to initialize connection for {address}: {e}")
+            return False
+
+        previous_name = self.agent_addresses.get(address)
+        if previous_name is not None and previous_name != card.name:
+            self._remove_address(address)
+        # 同名的agent card视为同一个Agent的多个副本
+        connection = self.remote_agent_connections.get(card.name)
+        if connection is None:
+            connection = RemoteAgentConnections(
+                agent_card=card, agent_url=address, http_pool=self.http_pool
+            )
+            self.remote_agent_connections[card.name] = connection
+        elif connection.get_agent().model_dump() != card.model_dump():
+            print(f"Agent card of {card.name} changed")
+            connection.card = card
+            if self.response_cache is not None:
+                self.response_cache.invalidate_agent(card.name)
+        connection.add_replica(address)
+        self.cards[card.name] = card
+        self.agent_addresses[address] = card.name
+        return True
+
+    def _remove_address(self, address: str):
+        """Removes one replica address, and its agent once no replica is left."""
+        agent_name = self.agent_addresses.pop(address, None)
+        connection = self.remote_agent_connections.get(agent_name)
+        if connection is None:
+            return
+        connection.remove_replica(address)
+        if not connection.replicas:
+            self._remove_agent(agent_name)
+
+    def _remove_agent(self, agent_name: str):
+        """Removes an agent from the roster the routing LLM sees."""
+        self.remote_agent_connections.pop(agent_name, None)
+        self.cards.pop(agent_name, None)
+        if self.response_cache is not None:
+            self.response_cache.invalidate_agent(agent_name)
+
+    def _refresh_roster(self):
+        """Rebuilds the roster string embedded in the routing instruction."""
         # Populate self.agents using the logic from original __init__ (via list_remote_agents)
         agent_info = []
         for agent_detail_dict in self.list_remote_agents(): 
             agent_info.append(json.dumps(agent_detail_dict))
         self.agents = "\n".join(agent_info)
+        self.agent_names = ", ".join(self.cards)
+        self.skill_index.build(self.cards.values())
+        self.roster_selector.build(self.cards.values())
+
+    def _schedule_health_check(self):
+        """Starts the background health check loop if a loop is running."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._health_check_task
+        # 初始化所在的事件循环可能已经结束或被阻塞（例如Gradio在自己的循环里运行处理函数）
+        if task and not task.done() and task.get_loop() is loop:
+            return
+        self._health_check_task = loop.create_task(self._health_check_loop())
+
+    async def _health_check_loop(self):
+        """Periodically re-probes every agent card and refreshes the roster.
+
+        Healthy agents are revalidated (a 304 when unchanged), changed cards
+        are picked up, agents that stop answering are removed from the roster
+        and retried like the ones that were down at startup.
+        """
+        interval = float(os.getenv("AGENT_HEALTH_CHECK_INTERVAL", "30"))
+        timeout = float(os.getenv("AGENT_HEALTH_CHECK_TIMEOUT", "5"))
+        while True:
+            await asyncio.sleep(interval)
+            addresses = set(self.agent_addresses) | self.unavailable_addresses
+            cards_before = dict(self.cards)
+            results = await asyncio.gather(
+                *(self._probe_agent(address, timeout) for address in addresses)
+            )
+            for address, healthy in zip(addresses, results):
+                if healthy:
+                    if address in self.unavailable_addresses:
+                        print(f"Agent at {address} is now available")
+                    self.unavailable_addresses.discard(address)
+                elif address not in self.unavailable_addresses:
+                    print(f"Agent at {address} is unhealthy, removing it from the roster")
+                    self.unavailable_addresses.add(address)
+                    self._remove_address(address)
+            if self.cards != cards_before:
+                self._refresh_roster()
+                print(f"Agent roster updated: {self.agents}")
+
+    async def _probe_agent(self, address: str, timeout: float) -> bool:
+        try:
+            return await asyncio.wait_for(
+                self._resolve_agent(self.http_pool.get(), address, revalidate=True),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"ERROR: Timed out probing agent at {address} after {timeout}s")
+            return False
+
+    async def close(self):
+        """Stops background work and closes the shared connection pool."""
+        if self._health_check_task and not self._health_check_task.done():
+            self._health_check_task.cancel()
+        for poll_task in list(self._poll_tasks):
+            poll_task.cancel()
+        await self.http_pool.aclose()
 
     # Class method to create and asynchronously initialize an instance
     @classmethod
@@ -158,6 +381,9 @@ class RoutingAgent:
         model = os.environ.get("LLM_MODEL", "gemini-2.5-flash-preview-04-17")
         agent_description = "This Routing agent orchestrates the decomposition of the user asking for weather forecast or airbnb accommodation"
         print(f"使用的模型供应商是: {provider}，模型是: {model}")
+        if provider == "google" and os.getenv("ROUTING_CONTEXT_CACHE", "false").lower() == "true":
+            # google的模型可以显式创建上下文缓存，缓存路由指令和工具声明
+            self.context_cache = GeminiContextCache(model)
         model = create_model(model, provider)
         return Agent(
             model=model,
@@ -166,19 +392,33 @@ class RoutingAgent:
             instruction=self.root_instruction,
             tools=[
                 self.send_message,
+                self.send_message_batch,
+                self.send_message_async,
+                self.check_pending_tasks,
+                self.load_remote_result,
+                self.list_remote_agents,
             ],
             before_model_callback=self.before_model_callback,
+            after_model_callback=self.after_model_callback,
         )
 
+    def select_roster(self, text: str) -> str:
+        """Details of the top-k agents for text, within the roster token budget."""
+        return "\n".join(self.roster_selector.select(text))
+
     def root_instruction(self, context: ReadonlyContext) -> str:
-        current_agent = self.check_active_agent(context)
+        # 指令中不包含会话状态，保持稳定的前缀以命中模型供应商的提示词缓存；
+        # 当前激活的Agent在before_model_callback中追加到最后一条消息里
         return f"""
         **Role:** You are an expert Routing Delegator. Your primary function is to accurately delegate user inquiries regarding weather or accommodations to the appropriate specialized remote agents.
 
         **Core Directives:**
         
         * **Task Delegation:** Utilize the `send_message` function to assign actionable tasks to remote agents.
-        * **Contextual Awareness for Remote Agents:** If a remote agent repeatedly requests user confirmation, assume it lacks access to the         full conversation history. In such cases, enrich the task description with all necessary contextual information relevant to that         specific agent.
+        * **Parallel Delegation:** If the request needs more than one remote agent, use the `send_message_batch` function once with all agent names and their tasks (paired by position) instead of calling `send_message` repeatedly.
+        * **Long-running Tasks:** For work the user does not need to wait for, use `send_message_async`, tell the user it was submitted, and use `check_pending_tasks` later to collect the results.
+        * **Shortened Results:** Large remote results are summarized or truncated. Use `load_remote_result` with the given `full_result_artifact` only when the missing details are needed.
+        * **Contextual Awareness for Remote Agents:** Each remote agent remembers the tasks it was already sent in this conversation, so a         follow-up task only needs the new information. If a remote agent repeatedly requests user confirmation, assume it lacks access to the         full conversation history. In such cases, enrich the task description with all necessary contextual information relevant to that         specific agent.
         * **Autonomous Agent Engagement:** Never seek user permission before engaging with remote agents. If multiple agents are required to         fulfill a request, connect with them directly without requesting user preference or confirmation.
         * **Transparent Communication:** Always present the complete and detailed response from the remote agent to the user.
         * **User Confirmation Relay:** If a remote agent asks for confirmation, and the user has not already provided it, relay this         confirmation request to the user.
@@ -190,8 +430,9 @@ class RoutingAgent:
         
         **Agent Roster:**
         
-        * Available Agents: `{self.agents}`
-        * Currently Active Seller Agent: `{current_agent["active_agent"]}`
+        * Available Agents: `{self.agent_names}`
+        * The routing state after each user message describes the agents most relevant to it; prefer those.
+        * If none of them fits the request, use the `list_remote_agents` function to see every agent.
                 """
 
     def check_active_agent(self, context: ReadonlyContext):
@@ -205,12 +446,101 @@ class RoutingAgent:
             return {"active_agent": f"{state['active_agent']}"}
         return {"active_agent": "None"}
 
-    def before_model_callback(self, callback_context: CallbackContext, llm_request):
+    async def before_model_callback(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> LlmResponse | None:
+        # 如果Agent是在asyncio.run()中初始化的，后台健康检查需要在应用的事件循环里重新启动
+        self._schedule_health_check()
         state = callback_context.state
         if "session_active" not in state or not state["session_active"]:
             if "session_id" not in state:
                 state["session_id"] = str(uuid.uuid4())
             state["session_active"] = True
+        if self.fast_path:
+            fast_path_response = self._fast_path_response(llm_request)
+            if fast_path_response is not None:
+                return fast_path_response
+        self._append_session_state(callback_context, llm_request)
+        if self.llm_cache is not None:
+            cached_response = await self.llm_cache.before_model_callback(callback_context, llm_request)
+            if cached_response is not None:
+                return cached_response
+        if self.context_cache is not None:
+            await self.context_cache.apply(llm_request)
+        return None
+
+    async def after_model_callback(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> LlmResponse | None:
+        if self.llm_cache is not None:
+            await self.llm_cache.after_model_callback(callback_context, llm_response)
+        if llm_response.usage_metadata is not None and not llm_response.partial:
+            self.prompt_cache_stats.record(llm_response.usage_metadata)
+            print(f"Prompt cache usage: {self.prompt_cache_stats.stats()}")
+        return None
+
+    def _append_session_state(self, callback_context: CallbackContext, llm_request: LlmRequest):
+        """Appends the per-session routing state after the conversation.
+
+        Keeping it out of the system instruction leaves the instruction a
+        stable prefix the provider can cache across turns and sessions.
+        """
+        if not llm_request.contents or llm_request.contents[-1].role != "user":
+            return
+        current_agent = self.check_active_agent(callback_context)
+        last_content = llm_request.contents[-1]
+        routing_state = f"[Routing state] Currently Active Seller Agent: `{current_agent['active_agent']}`"
+        # 工具结果没有可用于挑选的文本，只在用户消息后附上相关Agent
+        if not any(part.function_response for part in last_content.parts or []):
+            text = "".join(part.text for part in last_content.parts or [] if part.text)
+            shortlist = self.select_roster(text)
+            if shortlist:
+                routing_state += f"\nMost relevant agents for this message: `{shortlist}`"
+        # 创建新的Content，避免修改会话中保存的事件
+        llm_request.contents[-1] = types.Content(
+            role=last_content.role,
+            parts=[*(last_content.parts or []), types.Part(text=routing_state)],
+        )
+
+    def _fast_path_response(self, llm_request: LlmRequest) -> LlmResponse | None:
+        """Routes a fresh user message straight to a remote agent when its skills match.
+
+        Returns a synthesized `send_message` function call in place of the
+        routing LLM's response, so ADK runs the tool without a model call.
+        Only the first model call of a turn is considered; tool results are
+        always handed to the LLM. Once the session has history, a message may
+        be a follow-up that only the LLM can place, so it must then match more
+        than one term or a skill example.
+        """
+        if not llm_request.contents:
+            return None
+        last_content = llm_request.contents[-1]
+        if last_content.role != "user" or not last_content.parts:
+            return None
+        if any(part.function_response for part in last_content.parts):
+            return None
+        text = "".join(part.text for part in last_content.parts if part.text).strip()
+        if not text:
+            return None
+        has_history = len(llm_request.contents) > 1
+        agent_name = self.skill_index.match(text, min_terms=2 if has_history else 1)
+        if agent_name is None or agent_name not in self.remote_agent_connections:
+            print(f"Fast path miss, falling back to routing LLM: {self.skill_index.stats()}")
+            return None
+        print(f"Fast path hit, routing to {agent_name}: {self.skill_index.stats()}")
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        function_call=types.FunctionCall(
+                            name="send_message",
+                            args={"agent_name": agent_name, "task": text},
+                        )
+                    )
+                ],
+            )
+        )
 
     def list_remote_agents(self):
         """List the available remote agents you can use to delegate the task."""
@@ -247,21 +577,347 @@ class RoutingAgent:
             raise ValueError(f"Agent {agent_name} not found")
         state = tool_context.state
         state["active_agent"] = agent_name
+        try:
+            resp, task_state = await self._send_task(agent_name, task, state)
+        except AgentUnavailableError as e:
+            # 熔断时快速失败，并告诉LLM该Agent暂不可用
+            return {"error": str(e)}
+        except asyncio.TimeoutError:
+            return {"error": f"Agent {agent_name} did not respond in time, it may be overloaded"}
+        except (A2AClientHTTPError, httpx.HTTPError) as e:
+            # ADK不会捕获工具异常，整个回合会失败，改为把错误交给LLM
+            print(f"ERROR: Failed to send task to {agent_name}: {e}")
+            return {"error": f"Agent {agent_name} failed to handle the task: {e}"}
+        shaped = await self.result_shaper.shape(agent_name, resp, tool_context)
+        # 被摘要或截断的结果仍交给路由LLM，由它决定是否加载完整结果
+        if self.passthrough and task_state == TaskState.completed.value and resp and shaped is resp:
+            if self._is_single_function_call(tool_context):
+                # 直接把远程Agent的结果作为最终回复，省去路由LLM的复述
+                tool_context.actions.skip_summarization = True
+        return shaped
+
+    @staticmethod
+    def _is_single_function_call(tool_context: ToolContext) -> bool:
+        """Whether the model response that triggered this tool called only this one tool."""
+        for event in reversed(tool_context._invocation_context.session.events):
+            function_calls = event.get_function_calls()
+            if any(call.id == tool_context.function_call_id for call in function_calls):
+                return len(function_calls) == 1
+        return False
+
+    async def send_message_batch(
+        self, agent_names: list[str], tasks: list[str], tool_context: ToolContext
+    ):
+        """Sends several tasks to different remote agents at the same time
+
+        Use this instead of calling `send_message` several times when the user
+        inquiry needs more than one remote agent (e.g. weather and postcode of
+        the same city). All tasks are dispatched concurrently.
+
+        Args:
+            agent_names: The names of the agents to send the tasks to.
+            tasks: The comprehensive conversation context summary and goal for
+                each agent, in the same order as agent_names.
+            tool_context: The tool context this method runs in.
+
+        Returns:
+            A list with one entry per agent, holding the agent name, its
+            response parts and final task state, the error message if it
+            failed, and the elapsed time in seconds.
+        """
+        if len(agent_names) != len(tasks):
+            return {"error": "agent_names and tasks must have the same length"}
+        state = tool_context.state
+
+        async def _dispatch(agent_name: str, task: str) -> dict[str, Any]:
+            result: dict[str, Any] = {"agent_name": agent_name}
+            start = time.perf_counter()
+            try:
+                if agent_name not in self.remote_agent_connections:
+                    raise ValueError(f"Agent {agent_name} not found")
+                resp, result["state"] = await self._send_task(agent_name, task, state)
+                result["response"] = await self.result_shaper.shape(agent_name, resp, tool_context)
+            except Exception as e:
+                print(f"ERROR: Failed to send task to {agent_name}: {e}")
+                result["error"] = str(e)
+            result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+            return result
+
+        results = await asyncio.gather(*(_dispatch(*pair) for pair in zip(agent_names, tasks)))
+        state["active_agent"] = ", ".join(
+            r["agent_name"] for r in results if "error" not in r
+        )
+        return results
+
+    async def send_message_async(
+        self, agent_name: str, task: str, tool_context: ToolContext
+    ):
+        """Submits a task to a remote agent without waiting for it to finish
+
+        The task keeps running on the remote agent and its result is collected
+        in the background. Use `check_pending_tasks` later to get it.
+
+        Args:
+            agent_name: The name of the agent to send the task to.
+            task: The comprehensive conversation context summary
+                and goal to be achieved regarding user inquiry.
+            tool_context: The tool context this method runs in.
+
+        Returns:
+            The id and current state of the submitted task.
+        """
+        if agent_name not in self.remote_agent_connections:
+            raise ValueError(f"Agent {agent_name} not found")
+        client = self.remote_agent_connections[agent_name]
+        payload = create_send_message_payload(task, context_id=str(uuid.uuid4()))
+        try:
+            if client.get_agent().capabilities.streaming:
+                remote_task = await self._submit_task_streaming(client, payload)
+            else:
+                # a2a-sdk 0.2.5的服务端忽略blocking=False，不支持流式的Agent只能等待任务结束
+                remote_task = await self._submit_task_blocking(client, payload)
+        except AgentUnavailableError as e:
+            return {"error": str(e)}
+        except asyncio.TimeoutError:
+            return {"error": f"Agent {agent_name} did not respond in time, it may be overloaded"}
+        except (A2AClientHTTPError, httpx.HTTPError, ValueError) as e:
+            print(f"ERROR: Failed to submit task to {agent_name}: {e}")
+            return {"error": f"Agent {agent_name} rejected the task: {e}"}
+        if isinstance(remote_task, dict):
+            # Agent直接返回了消息而没有创建任务
+            return remote_task
+
+        pending = list(tool_context.state.get("pending_tasks", []))
+        pending.append({"agent_name": agent_name, "task_id": remote_task.id})
+        tool_context.state["pending_tasks"] = pending
+        return {"task_id": remote_task.id, "state": remote_task.status.state.value}
+
+    async def _submit_task_streaming(
+        self, client: RemoteAgentConnections, payload: dict[str, Any]
+    ) -> Task | dict:
+        """Starts a streaming request and returns once the remote task is created.
+
+        The stream is closed as soon as the first event names the task, so no
+        connection or concurrency slot is held for the rest of the remote run;
+        the task is then polled with tasks/get in the background.
+        """
+        message_request = SendStreamingMessageRequest(
+            id=str(uuid.uuid4()), params=MessageSendParams.model_validate(payload)
+        )
+        context_id = message_request.params.message.contextId
+        parts: list = []
+        async with aclosing(client.send_message_streaming(message_request, track_task=True)) as stream:
+            async for response in stream:
+                if isinstance(response.root, JSONRPCErrorResponse):
+                    raise ValueError(str(response.root.error))
+                event = response.root.result
+                if isinstance(event, Task):
+                    task_id, state = event.id, event.status.state.value
+                    parts = task_artifact_parts(event)
+                elif isinstance(event, TaskStatusUpdateEvent):
+                    task_id, state = event.taskId, event.status.state.value
+                elif isinstance(event, TaskArtifactUpdateEvent):
+                    task_id, state = event.taskId, TaskState.working.value
+                    parts = [part.model_dump(mode="json", exclude_none=True) for part in event.artifact.parts]
+                else:
+                    # 直接返回的Message，没有后续任务
+                    return {"response": event.model_dump(mode="json", exclude_none=True)["parts"]}
+                break
+            else:
+                raise ValueError("The agent closed the stream without creating a task")
+        self._track_remote_task(client, task_id, context_id, state, parts)
+        return Task(id=task_id, contextId=context_id, status={"state": state})
+
+    async def _submit_task_blocking(
+        self, client: RemoteAgentConnections, payload: dict[str, Any]
+    ) -> Task | dict:
+        message_request = SendMessageRequest(
+            id=str(uuid.uuid4()), params=MessageSendParams.model_validate(payload)
+        )
+        send_response: SendMessageResponse = await client.send_message(
+            message_request, track_task=True
+        )
+        if not isinstance(send_response.root, SendMessageSuccessResponse):
+            raise ValueError(str(send_response.root.error))
+        result = send_response.root.result
+        if not isinstance(result, Task):
+            return {"response": result.model_dump(mode="json", exclude_none=True)["parts"]}
+        self._track_remote_task(
+            client, result.id, result.contextId, result.status.state.value, task_artifact_parts(result)
+        )
+        return result
+
+    def _track_remote_task(
+        self,
+        client: RemoteAgentConnections,
+        task_id: str,
+        context_id: str | None,
+        state: str,
+        parts: list,
+    ):
+        """Records a submitted task and polls it in the background until it finishes."""
+        self._set_task_result(task_id, state, parts)
+        if state in TERMINAL_TASK_STATES:
+            client.forget_task(task_id)
+            return
+        client.pending_tasks.add(task_id)
+        self._start_background(self._poll_task(client, task_id, context_id))
+
+    async def check_pending_tasks(self, tool_context: ToolContext):
+        """Checks the tasks submitted with `send_message_async` in this conversation
+
+        Finished tasks are returned with their response and removed from the
+        pending list; unfinished ones are returned with their current state.
+
+        Args:
+            tool_context: The tool context this method runs in.
+
+        Returns:
+            A list with the agent name, task id, state and, for finished
+            tasks, the response of every pending task.
+        """
+        results = []
+        still_pending = []
+        for entry in tool_context.state.get("pending_tasks", []):
+            result = self.task_results.get(entry["task_id"])
+            if result is None:
+                results.append({**entry, "state": "unknown"})
+                continue
+            if result["state"] in TERMINAL_TASK_STATES or "error" in result:
+                self.task_results.pop(entry["task_id"], None)
+                self._task_result_times.pop(entry["task_id"], None)
+                result = {
+                    **result,
+                    "response": await self.result_shaper.shape(
+                        entry["agent_name"], result.get("response"), tool_context
+                    ),
+                }
+            else:
+                still_pending.append(entry)
+            results.append({**entry, **result})
+        tool_context.state["pending_tasks"] = still_pending
+        return results
+
+    async def load_remote_result(self, artifact_name: str, tool_context: ToolContext):
+        """Loads the full result of a remote agent that was summarized or truncated
+
+        Only call this when the details missing from the shortened result are
+        needed to answer the user.
+
+        Args:
+            artifact_name: The `full_result_artifact` given with the shortened result.
+            tool_context: The tool context this method runs in.
+
+        Returns:
+            The full text of the remote agent's result.
+        """
+        artifact = await tool_context.load_artifact(artifact_name)
+        if artifact is None or artifact.inline_data is None:
+            return {"error": f"Result {artifact_name} not found"}
+        return result_text(json.loads(artifact.inline_data.data.decode("utf-8")))
+
+    def _start_background(self, coroutine) -> asyncio.Task:
+        background_task = asyncio.create_task(coroutine)
+        self._poll_tasks.add(background_task)
+        background_task.add_done_callback(self._poll_tasks.discard)
+        return background_task
+
+    def _set_task_result(self, task_id: str, state: str, response: list | None = None, **extra):
+        """Records the latest state of a submitted task and drops stale results."""
+        now = time.monotonic()
+        self.task_results[task_id] = {"state": state, "response": response, **extra}
+        self._task_result_times[task_id] = now
+        # 没有人来取的结果在TTL后丢弃，避免无限增长
+        ttl = float(os.getenv("REMOTE_TASK_RESULT_TTL", "3600"))
+        for stale_id in [i for i, t in self._task_result_times.items() if now - t > ttl]:
+            self._task_result_times.pop(stale_id, None)
+            self.task_results.pop(stale_id, None)
+
+    async def _poll_task(
+        self, client: RemoteAgentConnections, task_id: str, context_id: str | None = None
+    ):
+        """Polls tasks/get with exponential backoff until the task finishes."""
+        delay = float(os.getenv("REMOTE_TASK_POLL_INITIAL_DELAY", "0.5"))
+        max_delay = float(os.getenv("REMOTE_TASK_POLL_MAX_DELAY", "10"))
+        deadline = time.monotonic() + float(os.getenv("REMOTE_TASK_POLL_TIMEOUT", "600"))
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+                try:
+                    response = await client.get_task(
+                        GetTaskRequest(id=str(uuid.uuid4()), params=TaskQueryParams(id=task_id)),
+                        context_id=context_id,
+                    )
+                except Exception as e:
+                    print(f"ERROR: Failed to poll task {task_id}: {e}")
+                    continue
+                if isinstance(response.root, JSONRPCErrorResponse):
+                    print(f"ERROR: Failed to poll task {task_id}: {response.root.error}")
+                    continue
+                remote_task = response.root.result
+                state = remote_task.status.state.value
+                self._set_task_result(task_id, state, task_artifact_parts(remote_task))
+                if state in TERMINAL_TASK_STATES:
+                    return
+            self._set_task_result(task_id, "unknown", error="Timed out waiting for the task")
+        finally:
+            client.forget_task(task_id)
+
+    async def _send_task(
+        self, agent_name: str, task: str, state
+    ) -> tuple[list | None, str | None]:
+        """Sends one task to a remote agent and returns its artifact parts and final task state.
+
+        Answers are served from and stored in the response cache when it is
+        enabled, but only for the first task to an agent in a session: follow-up
+        tasks depend on the remote conversation and always go to the agent.
+        """
         client = self.remote_agent_connections[agent_name]
 
         if not client:
             raise ValueError(f"Client not available for {agent_name}")
-        if "task_id" in state:
-            taskId = state["task_id"]
+        if self.response_cache is None or agent_name in (state.get("remote_contexts") or {}):
+            return await self._dispatch_task(client, task, state)
+        card = client.get_agent()
+        cached = self.response_cache.get(card, task)
+        if cached is not None:
+            print(f"Response cache hit for {agent_name}: {self.response_cache.stats()}")
+            # 记下缓存的这一轮，之后的任务不再走缓存，并把这一轮带给远程Agent
+            remote_contexts = dict(state.get("remote_contexts") or {})
+            remote_contexts[agent_name] = {
+                "cached_task": task,
+                "cached_answer": result_text(cached)[:CACHED_ANSWER_MAX_CHARS],
+            }
+            state["remote_contexts"] = remote_contexts
+            return cached, TaskState.completed.value
+        resp, task_state = await self._dispatch_task(client, task, state)
+        if resp and task_state == TaskState.completed.value:
+            self.response_cache.put(card, task, resp)
+        return resp, task_state
 
+    async def _dispatch_task(
+        self, client: RemoteAgentConnections, task: str, state
+    ) -> tuple[list | None, str | None]:
+        """Delivers one task to a remote agent over the blocking or streaming API.
+
+        The remote context id is kept per agent in the session state, so follow-up
+        tasks continue the remote agent's session instead of starting a new one.
+        """
+        agent_name = client.get_agent().name
+        remote_context = (state.get("remote_contexts") or {}).get(agent_name, {})
+        context_id = remote_context.get("context_id") or str(uuid.uuid4())
+        # 只有等待用户输入的任务才能继续，已结束的任务不能再接收消息
+        if remote_context.get("task_state") == TaskState.input_required.value:
+            task_id = remote_context["task_id"]
         else:
-            taskId = str(uuid.uuid4())
-        task_id = taskId
-        sessionId = state["session_id"]
-        if "context_id" in state:
-            context_id = state["context_id"]
-        else:
-            context_id = str(uuid.uuid4())
+            task_id = str(uuid.uuid4())
+        if "cached_task" in remote_context:
+            # 上一轮由响应缓存回答，远程会话中没有这一轮，随任务一起发送
+            task = (
+                f"Earlier in this conversation you were asked: {remote_context['cached_task']}\n"
+                f"and you answered: {remote_context['cached_answer']}\n\n{task}"
+            )
 
         messageId = ""
         metadata = {}
@@ -285,20 +941,42 @@ class RoutingAgent:
 
         if context_id:
             payload["message"]["contextId"] = context_id
-        
+
+        if self.streaming and client.get_agent().capabilities.streaming:
+            resp, task_state = await self._send_task_streaming(client, messageId, payload)
+        else:
+            resp, task_state = await self._send_task_blocking(client, messageId, payload)
+        if task_state:
+            # 重新赋值整个字典，ADK才会把修改记录到会话状态中
+            remote_contexts = dict(state.get("remote_contexts") or {})
+            remote_contexts[agent_name] = {
+                "context_id": context_id,
+                "task_id": task_id,
+                "task_state": task_state,
+            }
+            state["remote_contexts"] = remote_contexts
+        return resp, task_state
+
+    async def _send_task_blocking(
+        self,
+        client: RemoteAgentConnections,
+        message_id: str,
+        payload: dict[str, Any],
+    ) -> tuple[list | None, str | None]:
+        """Sends one task to a remote agent and waits for the resulting Task."""
         message_request = SendMessageRequest(
-            id=messageId, params=MessageSendParams.model_validate(payload)
+            id=message_id, params=MessageSendParams.model_validate(payload)
         )
         send_response: SendMessageResponse = await client.send_message( message_request= message_request)
         print("send_response", send_response)
 
         if not isinstance(send_response.root, SendMessageSuccessResponse):
             print("received non-success response. Aborting get task ")
-            return
+            return None, None
 
         if not isinstance(send_response.root.result, Task):
             print("received non-task response. Aborting get task ")
-            return
+            return None, None
 
         response = send_response
         if hasattr(response, "root"):
@@ -313,28 +991,123 @@ class RoutingAgent:
             for artifact in json_content["result"]["artifacts"]:
                 if artifact.get("parts"):
                     resp.extend(artifact["parts"])
-        return resp
+        return resp, json_content["result"]["status"]["state"]
 
+    async def _send_task_streaming(
+        self,
+        client: RemoteAgentConnections,
+        message_id: str,
+        payload: dict[str, Any],
+    ) -> tuple[list | None, str | None]:
+        """Streams one task to a remote agent, relaying every event to task_callback.
 
-def _get_initialized_routing_agent_sync():
-    """Synchronously creates and initializes the RoutingAgent."""
-    async def _async_main():
-        routing_agent_instance = await RoutingAgent.create(
-            remote_agent_addresses=[
-                os.getenv("POSTCODE_AGENT_URL", "http://localhost:10002"),
-                os.getenv("WEATHER_AGENT_URL", "http://localhost:10001"),
-            ]
+        Artifact chunks are reassembled by artifact id so the returned parts
+        match what the blocking path would have returned for the final Task.
+        """
+        card = client.get_agent()
+        message_request = SendStreamingMessageRequest(
+            id=message_id, params=MessageSendParams.model_validate(payload)
         )
-        return routing_agent_instance.create_agent()
+        artifacts: dict[str, list] = {}
+        task_state = None
+        async for response in client.send_message_streaming(message_request):
+            if isinstance(response.root, JSONRPCErrorResponse):
+                print(f"received error from {card.name}: {response.root.error}")
+                return None, None
+            event = response.root.result
+            if self.task_callback:
+                self.task_callback(event, card)
+            if isinstance(event, Task):
+                task_state = event.status.state.value
+                for artifact in event.artifacts or []:
+                    artifacts[artifact.artifactId] = list(artifact.parts)
+            elif isinstance(event, TaskArtifactUpdateEvent):
+                artifact = event.artifact
+                if event.append and artifact.artifactId in artifacts:
+                    artifacts[artifact.artifactId].extend(artifact.parts)
+                else:
+                    artifacts[artifact.artifactId] = list(artifact.parts)
+            elif isinstance(event, TaskStatusUpdateEvent):
+                task_state = event.status.state.value
+                if event.final:
+                    break
+
+        resp = []
+        for parts in artifacts.values():
+            resp.extend(part.model_dump(mode="json", exclude_none=True) for part in parts)
+        return resp, task_state
 
+
+def get_remote_agent_addresses() -> List[str]:
+    """Returns the remote agent addresses configured in the environment.
+
+    Each variable may hold a comma-separated list of replica URLs.
+    """
+    addresses = []
+    for value in [
+        os.getenv("POSTCODE_AGENT_URL", "http://localhost:10002"),
+        os.getenv("WEATHER_AGENT_URL", "http://localhost:10001"),
+    ]:
+        addresses.extend(url.strip() for url in value.split(",") if url.strip())
+    return addresses
+
+
+_routing_agent: RoutingAgent | None = None
+
+
+async def create_root_agent() -> Agent:
+    """Asynchronously creates and initializes the RoutingAgent and its ADK agent."""
+    global _routing_agent
+    routing_agent_instance = await RoutingAgent.create(
+        remote_agent_addresses=get_remote_agent_addresses(),
+        task_callback=relay_task_update,
+    )
+    _routing_agent = routing_agent_instance
+    return routing_agent_instance.create_agent()
+
+
+_root_agent_task: asyncio.Task | None = None
+
+
+async def get_root_agent() -> Agent:
+    """Returns the shared root agent, initializing it on first use.
+
+    Applications should await this on startup (e.g. from an ASGI lifespan)
+    so card discovery overlaps with their other startup work. Concurrent
+    callers share one initialization.
+    """
+    global _root_agent_task
+    if _root_agent_task is None:
+        _root_agent_task = asyncio.ensure_future(create_root_agent())
+    return await _root_agent_task
+
+
+async def close_root_agent() -> None:
+    """Closes the shared root agent's connections, if it was created."""
+    global _routing_agent, _root_agent_task
+    if _routing_agent is not None:
+        await _routing_agent.close()
+    _routing_agent = None
+    _root_agent_task = None
+
+
+def _get_initialized_routing_agent_sync():
+    """Synchronously creates and initializes the RoutingAgent."""
     try:
-        return asyncio.run(_async_main())
-    except RuntimeError as e:
-        if "asyncio.run() cannot be called from a running event loop" in str(e):
-            print(f"Warning: Could not initialize RoutingAgent with asyncio.run(): {e}. "
-                  "This can happen if an event loop is already running (e.g., in Jupyter). "
-                  "Consider initializing RoutingAgent within an async function in your application.")
-        raise
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(create_root_agent())
+    # 已经在事件循环中（例如Jupyter、ASGI服务），在独立线程中完成初始化
+    print("Warning: root_agent accessed synchronously inside a running event loop. "
+          "Consider awaiting get_root_agent() in your application instead.")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, create_root_agent()).result()
 
 
-root_agent = _get_initialized_routing_agent_sync()
+def __getattr__(name: str):
+    # 惰性创建root_agent，保证导入本模块时不做网络I/O（adk web 等工具仍可通过 agent.root_agent 访问）
+    if name == "root_agent":
+        root_agent = _get_initialized_routing_agent_sync()
+        globals()["root_agent"] = root_agent
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
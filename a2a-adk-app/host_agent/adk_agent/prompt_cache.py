@@ -0,0 +1,100 @@
+"""
+Prompt caching support for the routing agent.
+
+`PromptCacheStats` reports how many prompt tokens the provider served from
+its prefix cache. `GeminiContextCache` explicitly caches the routing
+instruction and tool declarations with the Gemini API for the `google`
+provider, so each request only sends the conversation itself.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from google.adk.models import LlmRequest
+from google.genai import Client, types
+
+
+class PromptCacheStats:
+    """Accumulates cached versus uncached prompt tokens from model usage metadata."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage_metadata) -> None:
+        if usage_metadata is None:
+            return
+        self.requests += 1
+        self.prompt_tokens += usage_metadata.prompt_token_count or 0
+        self.cached_tokens += usage_metadata.cached_content_token_count or 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_tokens": self.prompt_tokens - self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+        }
+
+
+class GeminiContextCache:
+    """Explicit Gemini context cache holding the system instruction and tools.
+
+    The cache is created lazily on the first request, since the tool
+    declarations only exist once ADK has built the request, and recreated
+    whenever the instruction or tools change or the cache expires. If the
+    API refuses to create it (e.g. the prefix is below the provider's
+    minimum size) requests are sent uncached.
+    """
+
+    def __init__(self, model: str, ttl_seconds: int | None = None):
+        self.model = model
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ROUTING_CONTEXT_CACHE_TTL", "3600"))
+        self._client = Client()
+        self._key: str | None = None
+        self._name: str | None = None
+        self._expires_at = 0.0
+
+    @staticmethod
+    def _cache_key(llm_request: LlmRequest) -> str:
+        config = llm_request.config
+        tools = [tool.model_dump(mode="json", exclude_none=True) for tool in config.tools or []]
+        payload = json.dumps(
+            [llm_request.model, str(config.system_instruction), tools], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def apply(self, llm_request: LlmRequest) -> None:
+        """Points llm_request at the cached prefix, creating the cache if needed."""
+        config = llm_request.config
+        if config is None or not config.system_instruction:
+            return
+        key = self._cache_key(llm_request)
+        if key != self._key or time.time() >= self._expires_at:
+            self._key = key
+            self._name = None
+            # 缓存只需在有效期内创建一次，失败后直到指令变化前不再重试
+            self._expires_at = time.time() + max(self.ttl_seconds - 60, 60)
+            try:
+                cache = await self._client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=config.system_instruction,
+                        tools=config.tools,
+                        tool_config=config.tool_config,
+                        ttl=f"{self.ttl_seconds}s",
+                    ),
+                )
+                self._name = cache.name
+                print(f"Created Gemini context cache {cache.name}")
+            except Exception as e:
+                print(f"WARNING: Failed to create Gemini context cache, sending uncached: {e}")
+        if self._name:
+            config.cached_content = self._name
+            config.system_instruction = None
+            config.tools = None
+            config.tool_config = None
@@ -14,45 +14,382 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
 from typing import Callable, Any
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import math
 import uuid
 
 import httpx
 
-from a2a.client import A2AClient
+from a2a.client import A2AClient, A2AClientHTTPError
 from a2a.types import (
+    GetTaskRequest,
+    GetTaskResponse,
     SendMessageResponse,
     SendMessageRequest,
+    SendStreamingMessageRequest,
+    SendStreamingMessageResponse,
     AgentCard,
     Task,
+    TaskState,
     TaskStatusUpdateEvent,
     TaskArtifactUpdateEvent,
 )
 from dotenv import load_dotenv
 import os
 import json
+import time
+
+from .resilience import (
+    AgentUnavailableError,
+    CircuitBreaker,
+    LatencyTracker,
+    RetryBudget,
+    backoff_delay,
+)
 
 load_dotenv()
 
 TaskCallbackArg = Task | TaskStatusUpdateEvent | TaskArtifactUpdateEvent
+
+# 流式请求在这些任务状态下结束
+FINAL_TASK_STATES = {
+    TaskState.completed.value,
+    TaskState.failed.value,
+    TaskState.canceled.value,
+    TaskState.rejected.value,
+    TaskState.input_required.value,
+}
 TaskUpdateCallback = Callable[[TaskCallbackArg, AgentCard], Task]
 
+# 当前请求的进度队列，由宿主应用在每轮对话开始时设置，用于把远程Agent的流式事件转发给前端
+TASK_UPDATE_QUEUE: ContextVar[asyncio.Queue | None] = ContextVar(
+    "task_update_queue", default=None
+)
+
+
+def relay_task_update(event: TaskCallbackArg, agent_card: AgentCard) -> None:
+    """A TaskUpdateCallback that forwards remote events to the current turn's queue."""
+    queue = TASK_UPDATE_QUEUE.get()
+    if queue is not None:
+        queue.put_nowait((event, agent_card))
+
+def create_httpx_client() -> httpx.AsyncClient:
+    """Creates the pooled httpx client shared by all remote agent connections.
+
+    Pool size, keep-alive and HTTP/2 are configured through the environment.
+    HTTP/2 needs the optional `h2` package and falls back to HTTP/1.1 without it.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("A2A_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("A2A_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("A2A_KEEPALIVE_EXPIRY", "30")),
+    )
+    http2 = os.getenv("A2A_HTTP2", "false").lower() == "true"
+    if http2 and importlib.util.find_spec("h2") is None:
+        print("WARNING: A2A_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=float(os.getenv("A2A_TIMEOUT", "30")), limits=limits, http2=http2
+    )
+
+
+def is_final_stream_event(response: SendStreamingMessageResponse) -> bool:
+    """Whether a streaming response ends the remote task's stream."""
+    result = getattr(response.root, "result", None)
+    if isinstance(result, TaskStatusUpdateEvent):
+        return result.final
+    if isinstance(result, Task):
+        return result.status.state.value in FINAL_TASK_STATES
+    # 错误响应和直接返回的Message同样结束这次请求
+    return not isinstance(result, TaskArtifactUpdateEvent)
+
+
+def _is_retryable(error: Exception, idempotent: bool) -> bool:
+    if idempotent:
+        return True
+    # A2AClient把httpx的网络错误包装成A2AClientHTTPError，原始异常在__cause__中
+    cause = error.__cause__ if isinstance(error, A2AClientHTTPError) else error
+    return isinstance(cause, httpx.ConnectError)
+
+
+class SharedHttpxPool:
+    """The host's managed HTTP connection pool for remote agent traffic.
+
+    httpx connections cannot move between event loops, and the host may
+    discover agents on one loop and serve requests on another (Gradio runs
+    handlers on its own loop), so one pooled client is kept per loop.
+    """
+
+    def __init__(self):
+        self._clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = create_httpx_client()
+        return client
+
+    async def aclose(self) -> None:
+        current_loop = asyncio.get_running_loop()
+        for loop, client in self._clients.items():
+            if loop is current_loop:
+                await client.aclose()
+            elif not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        self._clients.clear()
+
+
 class RemoteAgentConnections:
-    """A class to hold the connections to the remote agents."""
+    """A class to hold the connections to the remote agents.
 
-    def __init__(self, agent_card: AgentCard, agent_url: str):
+    One agent name can be served by several replica URLs. Requests go to the
+    replica ranked highest for their context_id by rendezvous hashing, so a
+    multi-turn conversation keeps hitting the replica holding its session,
+    unless that replica has more outstanding requests than the load bound
+    (A2A_REPLICA_LOAD_FACTOR times the average), in which case the next
+    replica in the ranking is used. Requests without a context go to the
+    least loaded replica.
+    """
+
+    def __init__(
+        self,
+        agent_card: AgentCard,
+        agent_url: str,
+        http_pool: SharedHttpxPool | None = None,
+        max_concurrency: int | None = None,
+    ):
         print(f"agent_card: {agent_card}")
         print(f"agent_url: {agent_url}")
-        self._httpx_client = httpx.AsyncClient(timeout=30)
-        self.agent_client = A2AClient(self._httpx_client, agent_card, url=agent_url)
+        # 未传入共享连接池时自己创建一个，并在close()中关闭
+        self._owns_http_pool = http_pool is None
+        self._http_pool = http_pool or SharedHttpxPool()
+        # 副本地址 -> 正在处理的请求数
+        self.replicas: dict[str, int] = {agent_url: 0}
+        self.load_factor = float(os.getenv("A2A_REPLICA_LOAD_FACTOR", "1.25"))
+        # 远程任务所在的副本，tasks/get 必须发到创建任务的副本
+        self._task_replicas: dict[str, str] = {}
         self.card = agent_card
         self.conversation_name = None
         self.conversation = None
         self.pending_tasks = set()
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("A2A_MAX_CONNECTIONS_PER_AGENT", "0"))
+        # 限制单个Agent的并发请求数，避免一个慢Agent占满整个连接池
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        # 自适应超时、重试预算和熔断
+        # 发送消息要等远程Agent跑完，轮询任务只需几毫秒，两者分别统计延迟
+        self.send_latency = LatencyTracker()
+        self.get_latency = LatencyTracker()
+        self.retry_budget = RetryBudget()
+        self.breaker = CircuitBreaker()
+        self.stream_idle_timeout = float(
+            os.getenv("A2A_STREAM_IDLE_TIMEOUT", os.getenv("A2A_TIMEOUT", "30"))
+        )
 
     def get_agent(self) -> AgentCard:
         return self.card
 
-    async def send_message(self, message_request: SendMessageRequest) -> SendMessageResponse:
-        return  await self.agent_client.send_message(message_request)
-        
\ No newline at end of file
+    def add_replica(self, agent_url: str) -> None:
+        self.replicas.setdefault(agent_url, 0)
+
+    def remove_replica(self, agent_url: str) -> None:
+        self.replicas.pop(agent_url, None)
+
+    def pick_replica(self, context_id: str | None = None) -> str:
+        """Chooses the replica for a request, see the class docstring."""
+        urls = list(self.replicas)
+        if len(urls) == 1:
+            return urls[0]
+        if not context_id:
+            return min(urls, key=self.replicas.__getitem__)
+        ranked = sorted(
+            urls,
+            key=lambda url: hashlib.sha1(f"{context_id}|{url}".encode("utf-8")).digest(),
+            reverse=True,
+        )
+        total = sum(self.replicas.values()) + 1
+        bound = max(1, math.ceil(self.load_factor * total / len(urls)))
+        for url in ranked:
+            if self.replicas[url] < bound:
+                return url
+        return ranked[0]
+
+    def _client_for(self, agent_url: str) -> A2AClient:
+        # A2AClient只是对httpx客户端的轻量包装，按当前事件循环的连接池创建
+        return A2AClient(self._http_pool.get(), self.card, url=agent_url)
+
+    @property
+    def agent_client(self) -> A2AClient:
+        return self._client_for(self.pick_replica())
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self, context_id: str | None):
+        agent_url = self.pick_replica(context_id)
+        async with self._semaphore or contextlib.nullcontext():
+            self.replicas[agent_url] = self.replicas.get(agent_url, 0) + 1
+            try:
+                yield agent_url
+            finally:
+                if agent_url in self.replicas:
+                    self.replicas[agent_url] -= 1
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            raise AgentUnavailableError(
+                f"Agent {self.card.name} is currently unavailable after repeated failures, try again later"
+            )
+
+    async def _call(self, make_call, latency: LatencyTracker, idempotent: bool):
+        """Runs one request under the adaptive timeout, retrying within the budget.
+
+        latency is the tracker of the operation, which sets its timeout.
+
+        Idempotent calls are retried on any transport failure or timeout;
+        others only when the connection could not be established, since the
+        request then never reached the agent.
+        """
+        self._check_breaker()
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(make_call(), timeout=latency.timeout())
+            except A2AClientHTTPError as e:
+                if e.status_code < 500:
+                    # 4xx是请求本身的问题，Agent能正常响应，视为健康
+                    self.breaker.record_success()
+                    raise
+                error = e
+            except (asyncio.TimeoutError, httpx.TransportError) as e:
+                error = e
+            except BaseException:
+                # 其它异常（包括取消）不能让半开状态的试探请求一直没有结果
+                self.breaker.record_abort()
+                raise
+            else:
+                latency.record(time.monotonic() - start)
+                self.breaker.record_success()
+                return result
+
+            self.breaker.record_failure()
+            attempt += 1
+            if not _is_retryable(error, idempotent) or not self.retry_budget.withdraw():
+                raise error
+            print(f"Retrying {self.card.name} after error (attempt {attempt}): {error!r}")
+            await asyncio.sleep(backoff_delay(attempt))
+            self._check_breaker()
+
+    async def send_message(
+        self, message_request: SendMessageRequest, track_task: bool = False
+    ) -> SendMessageResponse:
+        """Sends one request.
+
+        With track_task, the replica of an unfinished resulting task is
+        remembered for `get_task` until the caller calls `forget_task`.
+        """
+        async def make_call():
+            async with self._acquire(message_request.params.message.contextId) as agent_url:
+                response = await self._client_for(agent_url).send_message(message_request)
+            result = getattr(response.root, "result", None)
+            if (
+                track_task
+                and isinstance(result, Task)
+                and result.status.state.value not in FINAL_TASK_STATES
+            ):
+                self._task_replicas[result.id] = agent_url
+            return response
+
+        return await self._call(make_call, self.send_latency, idempotent=False)
+
+    async def send_message_streaming(
+        self, message_request: SendStreamingMessageRequest, track_task: bool = False
+    ) -> AsyncIterator[SendStreamingMessageResponse]:
+        """Streams one request, failing with asyncio.TimeoutError when the agent goes quiet.
+
+        The total duration of a stream cannot be predicted, so instead of the
+        adaptive timeout every event (including the first) must arrive within
+        A2A_STREAM_IDLE_TIMEOUT seconds. The breaker records a success as soon
+        as the final event arrives, since callers stop consuming there, or when
+        the caller closes the stream after receiving events. With track_task,
+        the replica of the task named by the first event is remembered as in
+        `send_message`.
+        """
+        self._check_breaker()
+        # None表示结果未知；调用方提前关闭生成器时也要让熔断器得到结果
+        succeeded = None
+        received = False
+        try:
+            async with self._acquire(message_request.params.message.contextId) as agent_url:
+                stream = self._client_for(agent_url).send_message_streaming(message_request)
+                try:
+                    while True:
+                        try:
+                            response = await asyncio.wait_for(
+                                anext(stream), timeout=self.stream_idle_timeout
+                            )
+                        except StopAsyncIteration:
+                            break
+                        if succeeded is None and is_final_stream_event(response):
+                            succeeded = True
+                            self.breaker.record_success()
+                        if track_task and not received and not is_final_stream_event(response):
+                            event = getattr(response.root, "result", None)
+                            if isinstance(event, Task):
+                                self._task_replicas[event.id] = agent_url
+                            elif isinstance(event, (TaskStatusUpdateEvent, TaskArtifactUpdateEvent)):
+                                self._task_replicas[event.taskId] = agent_url
+                        received = True
+                        yield response
+                finally:
+                    await stream.aclose()
+            if succeeded is None:
+                # 流正常结束但没有最终事件，Agent仍然正常响应
+                succeeded = True
+                self.breaker.record_success()
+        except A2AClientHTTPError as e:
+            if succeeded is None:
+                succeeded = e.status_code < 500
+                if succeeded:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+            raise
+        except (asyncio.TimeoutError, httpx.TransportError):
+            if succeeded is None:
+                succeeded = False
+                self.breaker.record_failure()
+            raise
+        finally:
+            if succeeded is None:
+                if received:
+                    # 调用方拿到事件后主动关闭了流，Agent是正常响应的
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_abort()
+
+    async def get_task(
+        self, request: GetTaskRequest, context_id: str | None = None
+    ) -> GetTaskResponse:
+        # 没有记录副本时，按任务的context_id找到创建它的副本
+        agent_url = self._task_replicas.get(request.params.id) or self.pick_replica(context_id)
+        return await self._call(
+            lambda: self._client_for(agent_url).get_task(request),
+            self.get_latency,
+            idempotent=True,
+        )
+
+    def forget_task(self, task_id: str) -> None:
+        self.pending_tasks.discard(task_id)
+        self._task_replicas.pop(task_id, None)
+
+    async def close(self) -> None:
+        if self._owns_http_pool:
+            await self._http_pool.aclose()
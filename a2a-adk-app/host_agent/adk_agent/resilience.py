@@ -0,0 +1,142 @@
+"""
+Per-agent resilience primitives: adaptive timeouts, retry budgets and circuit breaking.
+
+All thresholds are read from the environment so they can be tuned per deployment
+without code changes.
+"""
+
+import collections
+import os
+import random
+import time
+
+
+class AgentUnavailableError(Exception):
+    """Raised instead of calling a remote agent whose circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Tracks recent call latencies and derives an adaptive timeout from them.
+
+    Until enough samples are collected the static A2A_TIMEOUT is used. Afterwards
+    the timeout is the p99 latency times A2A_TIMEOUT_MULTIPLIER, clamped to
+    [A2A_MIN_TIMEOUT, A2A_TIMEOUT].
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: collections.deque[float] = collections.deque(maxlen=window)
+        self.min_samples = min_samples
+        self.max_timeout = float(os.getenv("A2A_TIMEOUT", "30"))
+        self.min_timeout = float(os.getenv("A2A_MIN_TIMEOUT", "5"))
+        self.multiplier = float(os.getenv("A2A_TIMEOUT_MULTIPLIER", "2"))
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def timeout(self) -> float:
+        if len(self._samples) < self.min_samples:
+            return self.max_timeout
+        adaptive = self.percentile(99) * self.multiplier
+        return min(self.max_timeout, max(self.min_timeout, adaptive))
+
+    def stats(self) -> dict[str, float | None]:
+        return {
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "timeout": self.timeout(),
+        }
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of recent requests.
+
+    Every request deposits A2A_RETRY_RATIO tokens (capped at A2A_RETRY_BURST),
+    every retry withdraws one, so a degraded agent cannot multiply its load.
+    """
+
+    def __init__(self):
+        self.ratio = float(os.getenv("A2A_RETRY_RATIO", "0.2"))
+        self.burst = float(os.getenv("A2A_RETRY_BURST", "10"))
+        self._tokens = self.burst
+
+    def deposit(self) -> None:
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (starting at 1)."""
+    base = float(os.getenv("A2A_RETRY_BASE_DELAY", "0.2"))
+    cap = float(os.getenv("A2A_RETRY_MAX_DELAY", "2"))
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Opens after A2A_BREAKER_FAILURES consecutive failures.
+
+    While open every call fails fast. After A2A_BREAKER_RESET_TIMEOUT seconds
+    one trial call is let through (half-open); its outcome closes or reopens
+    the breaker. Callers must end every allowed call with `record_success`,
+    `record_failure` or `record_abort`; a trial that still reports nothing
+    within the reset timeout is replaced by a new one.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.failure_threshold = int(os.getenv("A2A_BREAKER_FAILURES", "5"))
+        self.reset_timeout = float(os.getenv("A2A_BREAKER_RESET_TIMEOUT", "30"))
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at = 0.0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_started_at = now
+            return True
+        if self.state == self.HALF_OPEN:
+            # 半开状态下只放行一个试探请求，试探请求一直没有结果时再放行一个
+            if now - self._trial_started_at < self.reset_timeout:
+                return False
+            self._trial_started_at = now
+            return True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_abort(self) -> None:
+        """Ends a call that was abandoned before its outcome was known.
+
+        A half-open trial counts as failed so the breaker reopens instead of
+        waiting for it; in the closed state nothing is recorded.
+        """
+        if self.state == self.HALF_OPEN:
+            self.record_failure()
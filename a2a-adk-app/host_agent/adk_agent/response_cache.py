@@ -0,0 +1,105 @@
+"""
+TTL/LRU cache for remote agent responses, used in front of RoutingAgent.send_message.
+
+Entries are keyed by agent name, card version and a normalized task text, so
+a changed card never serves answers produced by its previous version. Agents
+whose card skills carry a "no-cache" tag, or whose TTL is configured as 0,
+are never cached.
+"""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any
+
+from a2a.types import AgentCard
+
+NON_CACHEABLE_TAGS = {"no-cache", "nocache", "non-cacheable"}
+_TRAILING_PUNCTUATION = "?？。.!！ "
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_task(task: str) -> str:
+    """Case-folds task, collapses whitespace and strips trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", task.casefold()).strip(_TRAILING_PUNCTUATION)
+
+
+def is_cacheable(card: AgentCard) -> bool:
+    """Whether the card allows its responses to be cached."""
+    return not any(
+        tag.lower() in NON_CACHEABLE_TAGS for skill in card.skills for tag in (skill.tags or [])
+    )
+
+
+class ResponseCache:
+    """A size-bounded LRU cache with per-agent TTLs and hit/miss counters."""
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        default_ttl: float | None = None,
+        agent_ttls: dict[str, float] | None = None,
+    ):
+        self.max_entries = max_entries or int(os.getenv("ROUTING_RESPONSE_CACHE_SIZE", "256"))
+        self.default_ttl = (
+            default_ttl
+            if default_ttl is not None
+            else float(os.getenv("ROUTING_RESPONSE_CACHE_TTL", "300"))
+        )
+        # 每个Agent单独的过期时间，例如 {"Weather Agent": 600, "PostCode Agent": 86400}
+        self.agent_ttls = (
+            agent_ttls
+            if agent_ttls is not None
+            else json.loads(os.getenv("ROUTING_RESPONSE_CACHE_TTLS", "{}"))
+        )
+        self._entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, card: AgentCard) -> float:
+        if not is_cacheable(card):
+            return 0
+        return float(self.agent_ttls.get(card.name, self.default_ttl))
+
+    @staticmethod
+    def _key(card: AgentCard, task: str) -> tuple:
+        return (card.name, card.version, normalize_task(task))
+
+    def get(self, card: AgentCard, task: str) -> Any | None:
+        if self.ttl_for(card) <= 0:
+            return None
+        key = self._key(card, task)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, card: AgentCard, task: str, value: Any) -> None:
+        ttl = self.ttl_for(card)
+        if ttl <= 0:
+            return
+        key = self._key(card, task)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_agent(self, agent_name: str) -> None:
+        for key in [key for key in self._entries if key[0] == agent_name]:
+            del self._entries[key]
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "size": len(self._entries),
+        }
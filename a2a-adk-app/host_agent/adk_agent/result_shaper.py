@@ -0,0 +1,151 @@
+"""
+Shaping of remote agent results before they reach the routing LLM.
+
+Every function response stays in the session history and is re-sent on each
+later model call, so large remote outputs are bounded here: configured
+DataPart fields are extracted, and results over the per-agent token budget
+are summarized by a cheap model (or truncated) while the full result is
+saved as an ADK artifact that the LLM can load on demand.
+"""
+
+import json
+import os
+import uuid
+from typing import Any
+
+from google.adk.models import BaseLlm, LlmRequest
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+from .roster_selector import estimate_tokens
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the following result of a remote agent for another assistant. "
+    "Keep every number, name, date and other concrete fact; drop repetition and formatting. "
+    "Answer in the language of the result."
+)
+
+
+def _json_env(name: str) -> dict[str, Any]:
+    try:
+        return json.loads(os.getenv(name, "") or "{}")
+    except json.JSONDecodeError:
+        print(f"WARNING: {name} is not valid JSON, ignoring it")
+        return {}
+
+
+def result_text(parts: list) -> str:
+    """Plain text of JSON artifact parts, with data parts rendered as JSON."""
+    texts = []
+    for part in parts:
+        if part.get("text"):
+            texts.append(part["text"])
+        elif part.get("data") is not None:
+            texts.append(json.dumps(part["data"], ensure_ascii=False))
+    return "\n".join(texts)
+
+
+class ResultShaper:
+    """Bounds the size of remote results handed to the routing LLM.
+
+    ROUTING_RESULT_MAX_TOKENS is the default budget, overridden per agent by
+    ROUTING_RESULT_MAX_TOKENS_PER_AGENT. ROUTING_RESULT_DATA_FIELDS lists, per
+    agent, the DataPart fields to keep.
+    """
+
+    def __init__(self, summary_llm: BaseLlm | None = None):
+        self.max_tokens = int(os.getenv("ROUTING_RESULT_MAX_TOKENS", "2000"))
+        self.agent_max_tokens: dict[str, int] = _json_env("ROUTING_RESULT_MAX_TOKENS_PER_AGENT")
+        self.data_fields: dict[str, list[str]] = _json_env("ROUTING_RESULT_DATA_FIELDS")
+        self.summary_llm = summary_llm
+
+    def extract_fields(self, agent_name: str, parts: list) -> list:
+        """Keeps only the configured fields of the agent's DataParts."""
+        fields = self.data_fields.get(agent_name)
+        if not fields:
+            return parts
+        shaped = []
+        for part in parts:
+            if isinstance(part.get("data"), dict):
+                part = {**part, "data": {k: v for k, v in part["data"].items() if k in fields}}
+            shaped.append(part)
+        return shaped
+
+    async def shape(
+        self, agent_name: str, parts: list | None, tool_context: ToolContext
+    ) -> list | dict | None:
+        """Returns parts unchanged when within budget, otherwise a bounded result.
+
+        The bounded result holds the summarized or truncated parts under
+        `result`, plus the name of the artifact holding the full result.
+        """
+        if not parts:
+            return parts
+        parts = self.extract_fields(agent_name, parts)
+        budget = self.agent_max_tokens.get(agent_name, self.max_tokens)
+        if estimate_tokens(json.dumps(parts, ensure_ascii=False)) <= budget:
+            return parts
+
+        shaped: dict[str, Any] = {}
+        artifact_name = f"remote_result_{uuid.uuid4().hex[:12]}.json"
+        try:
+            await tool_context.save_artifact(
+                artifact_name,
+                types.Part.from_bytes(
+                    data=json.dumps(parts, ensure_ascii=False).encode("utf-8"),
+                    mime_type="application/json",
+                ),
+            )
+            shaped["full_result_artifact"] = artifact_name
+        except ValueError as e:
+            # Runner没有配置artifact_service时只能丢弃完整结果
+            print(f"WARNING: Could not save the full result of {agent_name}: {e}")
+
+        summary = await self._summarize(result_text(parts), budget)
+        if summary:
+            shaped["result"] = [{"kind": "text", "text": summary}]
+            shaped["note"] = "The result was summarized."
+        else:
+            shaped["result"] = self._truncate(parts, budget)
+            shaped["note"] = "The result was truncated."
+        if "full_result_artifact" in shaped:
+            shaped["note"] += " Use `load_remote_result` with full_result_artifact only if the details are needed."
+        return shaped
+
+    async def _summarize(self, text: str, budget: int) -> str:
+        if self.summary_llm is None or not text:
+            return ""
+        llm_request = LlmRequest(
+            model=self.summary_llm.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=text)])],
+            config=types.GenerateContentConfig(
+                system_instruction=SUMMARY_INSTRUCTION,
+                max_output_tokens=budget,
+            ),
+        )
+        summary = ""
+        try:
+            async for llm_response in self.summary_llm.generate_content_async(llm_request):
+                if llm_response.content and llm_response.content.parts:
+                    summary += "".join(p.text for p in llm_response.content.parts if p.text)
+        except Exception as e:
+            print(f"WARNING: Failed to summarize the remote result, truncating instead: {e}")
+            return ""
+        return summary
+
+    @staticmethod
+    def _truncate(parts: list, budget: int) -> list:
+        """Keeps parts in order until the budget is used up, cutting the last text part."""
+        truncated = []
+        remaining = budget
+        for part in parts:
+            cost = estimate_tokens(json.dumps(part, ensure_ascii=False))
+            if cost <= remaining:
+                truncated.append(part)
+                remaining -= cost
+                continue
+            if part.get("text") and remaining > 0:
+                keep = int(len(part["text"]) * remaining / cost)
+                truncated.append({**part, "text": part["text"][:keep] + "…"})
+            break
+        return truncated
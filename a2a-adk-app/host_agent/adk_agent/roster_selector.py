@@ -0,0 +1,99 @@
+"""
+Token-budgeted selection of the agent roster shown to the routing LLM.
+
+A lexical index over agent names, descriptions, skills and tags is built
+once per roster change; each turn the agents ranked highest for the current
+user message are appended to the routing state as a shortlist, within a
+token budget. The instruction itself only names the agents so it stays a
+small, stable prefix the provider can cache.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Iterable
+
+from a2a.types import AgentCard
+
+from .skill_router import tokenize
+
+_CJK_RUN_RE = re.compile(r"[\u4e00-\u9fff]+")
+
+# 各字段的权重，标签和技能名最能区分Agent
+FIELD_WEIGHTS = {"tags": 3.0, "name": 2.0, "skill": 2.0, "description": 1.0, "examples": 1.0}
+
+
+def index_terms(text: str) -> list[str]:
+    """English words plus Chinese character bigrams of text."""
+    terms = list(tokenize(text))
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per Chinese character, one per four other characters."""
+    cjk = sum(len(run) for run in _CJK_RUN_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class RosterSelector:
+    """Ranks agents against a message and picks the top-k within a token budget."""
+
+    def __init__(self, top_k: int | None = None, token_budget: int | None = None):
+        self.top_k = top_k or int(os.getenv("ROUTING_ROSTER_TOP_K", "8"))
+        self.token_budget = token_budget or int(os.getenv("ROUTING_ROSTER_TOKEN_BUDGET", "1500"))
+        self._entries: list[tuple[dict, str, Counter]] = []
+        self._idf: dict[str, float] = {}
+
+    def build(self, cards: Iterable[AgentCard]) -> None:
+        """Rebuilds the index from the current agent cards."""
+        entries = []
+        document_frequency: Counter = Counter()
+        for card in cards:
+            fields = {
+                "name": card.name,
+                "description": card.description or "",
+                "skill": " ".join(f"{skill.name} {skill.description or ''}" for skill in card.skills),
+                "tags": " ".join(tag for skill in card.skills for tag in (skill.tags or [])),
+                "examples": " ".join(ex for skill in card.skills for ex in (skill.examples or [])),
+            }
+            weights: Counter = Counter()
+            for field, text in fields.items():
+                for term in index_terms(text):
+                    weights[term] += FIELD_WEIGHTS[field]
+            document_frequency.update(weights.keys())
+            entry = {"name": card.name, "description": card.description}
+            entries.append((entry, json.dumps(entry), weights))
+        total = len(entries)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def select(self, text: str) -> list[str]:
+        """Returns the JSON roster lines of the best-matching agents for text."""
+        query = set(index_terms(text))
+        scored = []
+        for position, (entry, line, weights) in enumerate(self._entries):
+            score = sum(weights[term] * self._idf.get(term, 0.0) for term in query if term in weights)
+            scored.append((-score, position, line))
+        scored.sort()
+
+        selected = []
+        used_tokens = 0
+        for _, _, line in scored[: self.top_k]:
+            cost = estimate_tokens(line)
+            if selected and used_tokens + cost > self.token_budget:
+                break
+            selected.append(line)
+            used_tokens += cost
+        return selected
@@ -0,0 +1,111 @@
+"""
+Deterministic skill/tag router used as a fast path in front of the routing LLM.
+
+The index is precomputed from the discovered AgentCard skills. A message is
+routed directly only when the terms it contains point at exactly one agent
+with enough confidence; everything else falls back to the LLM.
+"""
+
+import json
+import os
+import re
+from typing import Iterable
+
+from a2a.types import AgentCard
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split()).rstrip("?？。.!！")
+
+
+def tokenize(text: str) -> set[str]:
+    """Lower-cased alphanumeric words of text."""
+    return set(_WORD_RE.findall(text.lower()))
+
+
+class SkillIndex:
+    """Keyword index over agent skills with fast-path hit counters.
+
+    Skill tags plus any extra keywords configured in ROUTING_FAST_PATH_KEYWORDS
+    (a JSON object of agent name -> list of keywords, e.g. {"Weather Agent": ["天气"]})
+    are the terms that identify an agent. Chinese keywords are matched as
+    substrings since they are not separated by spaces. A message equal to one
+    of a skill's examples is a strong match for its agent.
+    """
+
+    def __init__(self, extra_keywords: dict[str, list[str]] | None = None):
+        if extra_keywords is None:
+            extra_keywords = json.loads(os.getenv("ROUTING_FAST_PATH_KEYWORDS", "{}"))
+        self.extra_keywords = extra_keywords
+        self._words: dict[str, set[str]] = {}
+        self._phrases: dict[str, set[str]] = {}
+        self._examples: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, cards: Iterable[AgentCard]) -> None:
+        """Rebuilds the index from the current agent cards."""
+        words: dict[str, set[str]] = {}
+        phrases: dict[str, set[str]] = {}
+        examples: dict[str, str] = {}
+        for card in cards:
+            for skill in card.skills:
+                for example in skill.examples or []:
+                    examples[_normalize(example)] = card.name
+            terms = [tag for skill in card.skills for tag in (skill.tags or [])]
+            terms.extend(self.extra_keywords.get(card.name, []))
+            for term in terms:
+                term = term.strip().lower()
+                if not term:
+                    continue
+                if _CJK_RE.search(term) or " " in term:
+                    phrases.setdefault(card.name, set()).add(term)
+                else:
+                    words.setdefault(card.name, set()).add(term)
+        self._words = words
+        self._phrases = phrases
+        self._examples = examples
+
+    def candidates(self, text: str) -> dict[str, int]:
+        """Number of distinct terms present in text, per matching agent."""
+        lowered = text.lower()
+        tokens = tokenize(lowered)
+        matched = {}
+        for name, terms in self._words.items():
+            if terms & tokens:
+                matched[name] = len(terms & tokens)
+        for name, terms in self._phrases.items():
+            count = sum(1 for term in terms if term in lowered)
+            if count:
+                matched[name] = matched.get(name, 0) + count
+        return matched
+
+    def match(self, text: str, min_terms: int = 1) -> str | None:
+        """Returns the single agent text unambiguously targets, or None.
+
+        The agent must match at least min_terms terms, unless text is one of
+        its skill examples.
+        """
+        example_agent = self._examples.get(_normalize(text))
+        if example_agent is not None:
+            self.hits += 1
+            return example_agent
+        matched = self.candidates(text)
+        if len(matched) == 1:
+            name, count = matched.popitem()
+            if count >= min_terms:
+                self.hits += 1
+                return name
+        self.misses += 1
+        return None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3)}
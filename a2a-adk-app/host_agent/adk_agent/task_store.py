@@ -0,0 +1,246 @@
+"""
+Bounded A2A task stores for long-running servers.
+
+Both stores cap the message history kept per task (TASK_MAX_HISTORY), drop
+terminal tasks TASK_STORE_TTL seconds after they finished and unfinished
+tasks TASK_STORE_IDLE_TTL seconds after their last update. Live tasks are
+kept as objects, since they are saved on every streamed event; finished tasks
+are stored as compact JSON (compressed above TASK_COMPRESS_MIN_BYTES).
+`SqliteTaskStore` additionally persists tasks in a WAL-mode SQLite file with
+batched writes, so `tasks/get` keeps working across restarts.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from a2a.server.tasks import TaskStore
+from a2a.types import Task, TaskState
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = {
+    TaskState.completed,
+    TaskState.canceled,
+    TaskState.failed,
+    TaskState.rejected,
+}
+
+# 压缩后的数据以该字节开头，未压缩的JSON总是以"{"开头
+_COMPRESSED_PREFIX = b"z"
+
+
+class _CompactTaskStore(TaskStore):
+    """Shared history capping and encoding of the bounded task stores."""
+
+    def __init__(self):
+        self.ttl = float(os.getenv("TASK_STORE_TTL", "3600"))
+        self.idle_ttl = float(os.getenv("TASK_STORE_IDLE_TTL", "86400"))
+        self.max_history = int(os.getenv("TASK_MAX_HISTORY", "20"))
+        self.compress_min_bytes = int(os.getenv("TASK_COMPRESS_MIN_BYTES", "1024"))
+
+    def cap_history(self, task: Task) -> Task:
+        if self.max_history and task.history and len(task.history) > self.max_history:
+            return task.model_copy(update={"history": task.history[-self.max_history:]})
+        return task
+
+    def encode(self, task: Task) -> bytes:
+        data = self.cap_history(task).model_dump_json(exclude_none=True).encode("utf-8")
+        if len(data) >= self.compress_min_bytes:
+            return _COMPRESSED_PREFIX + zlib.compress(data)
+        return data
+
+    @staticmethod
+    def decode(data: bytes) -> Task:
+        if data.startswith(_COMPRESSED_PREFIX):
+            data = zlib.decompress(data[len(_COMPRESSED_PREFIX):])
+        return Task.model_validate_json(data)
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        """Starlette lifespan that closes the store on shutdown."""
+        yield
+        await self.close()
+
+    async def close(self) -> None:
+        pass
+
+
+class BoundedTaskStore(_CompactTaskStore):
+    """In-memory task store that expires finished and idle tasks."""
+
+    def __init__(self):
+        super().__init__()
+        # 未结束的任务保存为对象，结束后才编码
+        self.live: dict[str, Task] = {}
+        self.tasks: dict[str, bytes] = {}
+        # 任务 -> 过期时间，TTL固定，因此插入顺序即过期顺序
+        self._idle_expiry: OrderedDict[str, float] = OrderedDict()
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+
+    async def save(self, task: Task) -> None:
+        self._forget(task.id)
+        if task.status.state in TERMINAL_STATES:
+            self.tasks[task.id] = self.encode(task)
+            self._expiry[task.id] = time.monotonic() + self.ttl
+        else:
+            self.live[task.id] = self.cap_history(task)
+            self._idle_expiry[task.id] = time.monotonic() + self.idle_ttl
+        self._evict_expired()
+
+    async def get(self, task_id: str) -> Task | None:
+        self._evict_expired()
+        if task_id in self.live:
+            return self.live[task_id]
+        data = self.tasks.get(task_id)
+        return self.decode(data) if data is not None else None
+
+    async def delete(self, task_id: str) -> None:
+        self._forget(task_id)
+
+    def _forget(self, task_id: str) -> None:
+        self.live.pop(task_id, None)
+        self.tasks.pop(task_id, None)
+        self._idle_expiry.pop(task_id, None)
+        self._expiry.pop(task_id, None)
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for expiry in (self._idle_expiry, self._expiry):
+            while expiry:
+                task_id, expires_at = next(iter(expiry.items()))
+                if expires_at > now:
+                    break
+                self._forget(task_id)
+
+
+class SqliteTaskStore(_CompactTaskStore):
+    """SQLite (WAL) task store with write-behind batching.
+
+    Saves are buffered and written in one transaction every
+    TASK_STORE_FLUSH_INTERVAL seconds, or once TASK_STORE_BATCH_SIZE tasks are
+    pending; reads see buffered tasks immediately, and buffered tasks are only
+    encoded when they are written. Expired tasks are deleted on each flush.
+    """
+
+    def __init__(self, path: str | None = None):
+        super().__init__()
+        self.path = path or os.getenv("TASK_STORE_PATH", "tasks.sqlite3")
+        self.flush_interval = float(os.getenv("TASK_STORE_FLUSH_INTERVAL", "0.5"))
+        self.batch_size = int(os.getenv("TASK_STORE_BATCH_SIZE", "100"))
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, finished_at REAL, updated_at REAL, data BLOB)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_finished_at ON tasks (finished_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_updated_at ON tasks (updated_at)")
+        self._conn.commit()
+        # task id -> 任务，None表示待删除
+        self._pending: dict[str, Task | None] = {}
+        # 正在写入数据库的一批，写入完成前读取仍以它为准
+        self._writing: dict[str, Task | None] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+
+    async def save(self, task: Task) -> None:
+        self._pending[task.id] = self.cap_history(task)
+        self._schedule_flush()
+
+    async def get(self, task_id: str) -> Task | None:
+        for buffered in (self._pending, self._writing):
+            if task_id in buffered:
+                return buffered[task_id]
+        # 读取与flush共用一个连接，不能和写入同时进行
+        async with self._lock:
+            if task_id in self._pending:
+                return self._pending[task_id]
+            row = await asyncio.to_thread(self._select, task_id)
+        if row is None:
+            return None
+        finished_at, updated_at, data = row
+        now = time.time()
+        if finished_at is not None and now - finished_at > self.ttl:
+            return None
+        if finished_at is None and now - updated_at > self.idle_ttl:
+            return None
+        return self.decode(data)
+
+    async def delete(self, task_id: str) -> None:
+        self._pending[task_id] = None
+        self._schedule_flush()
+
+    async def close(self) -> None:
+        await self.flush()
+        self._conn.close()
+
+    def _schedule_flush(self) -> None:
+        if len(self._pending) >= self.batch_size:
+            flush_task = asyncio.create_task(self.flush())
+            self._background.add(flush_task)
+            flush_task.add_done_callback(self._background.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Writes all buffered saves and deletes in one transaction."""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._writing = batch
+            now = time.time()
+            rows = [
+                (
+                    task_id,
+                    now if task.status.state in TERMINAL_STATES else None,
+                    now,
+                    self.encode(task),
+                )
+                for task_id, task in batch.items()
+                if task is not None
+            ]
+            deleted = [(task_id,) for task_id, task in batch.items() if task is None]
+            try:
+                await asyncio.to_thread(self._write, rows, deleted)
+            except sqlite3.Error as e:
+                logger.error("Failed to write %d tasks: %s", len(batch), e)
+                # 写入失败时保留数据，下次再试，期间的新数据优先
+                self._pending = {**batch, **self._pending}
+            finally:
+                self._writing = {}
+
+    def _select(self, task_id: str):
+        return self._conn.execute(
+            "SELECT finished_at, updated_at, data FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+
+    def _write(self, rows: list[tuple], deleted: list[tuple[str]]) -> None:
+        now = time.time()
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM tasks WHERE id = ?", deleted)
+            self._conn.execute("DELETE FROM tasks WHERE finished_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM tasks WHERE finished_at IS NULL AND updated_at < ?",
+                (now - self.idle_ttl,),
+            )
+
+
+def create_task_store() -> _CompactTaskStore:
+    """Returns the task store selected by TASK_STORE_BACKEND (memory or sqlite)."""
+    if os.getenv("TASK_STORE_BACKEND", "memory").lower() == "sqlite":
+        return SqliteTaskStore()
+    return BoundedTaskStore()
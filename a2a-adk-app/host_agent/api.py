@@ -0,0 +1,227 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import uuid
+from contextlib import aclosing, asynccontextmanager
+
+import click
+import uvicorn
+from a2a.server.agent_execution import AgentExecutor
+from a2a.server.agent_execution.context import RequestContext
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.events.event_queue import EventQueue
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.server.tasks import TaskStore, TaskUpdater
+from a2a.types import (
+    AgentCapabilities,
+    AgentCard,
+    AgentSkill,
+    Part,
+    TaskState,
+    TextPart,
+    UnsupportedOperationError,
+)
+from a2a.utils.errors import ServerError
+from adk_agent.agent import close_root_agent
+from adk_agent.task_store import create_task_store
+from runtime import (
+    SESSION_SERVICE,
+    USER_ID,
+    final_response_text,
+    format_task_update,
+    get_runner,
+    run_turn,
+)
+from sse_starlette.sse import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+
+def serialize_event(event, agent_card) -> dict:
+    """JSON form of an ADK event, or of a remote agent event relayed during a tool call."""
+    if agent_card is None:
+        return {
+            "type": "adk_event",
+            "event": event.model_dump(mode="json", exclude_none=True, by_alias=True),
+            "final": event.is_final_response(),
+        }
+    return {
+        "type": "remote_event",
+        "agent_name": agent_card.name,
+        "event": event.model_dump(mode="json", exclude_none=True),
+    }
+
+
+async def parse_chat_request(request: Request) -> tuple[str, str, str]:
+    body = await request.json()
+    message = body.get("message")
+    if not message:
+        raise ValueError("message is required")
+    return body.get("user_id") or USER_ID, body.get("session_id") or uuid.uuid4().hex, message
+
+
+async def chat(request: Request) -> JSONResponse:
+    """Run one turn and return the final response together with all events."""
+    try:
+        user_id, session_id, message = await parse_chat_request(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    events = []
+    response_text = ""
+    async with aclosing(run_turn(user_id, session_id, message)) as turn:
+        async for event, agent_card in turn:
+            events.append(serialize_event(event, agent_card))
+            if agent_card is None and event.is_final_response():
+                response_text = final_response_text(event)
+                break
+    return JSONResponse(
+        {"session_id": session_id, "response": response_text, "events": events}
+    )
+
+
+async def chat_stream(request: Request) -> EventSourceResponse | JSONResponse:
+    """Run one turn and stream every event as server-sent events."""
+    try:
+        user_id, session_id, message = await parse_chat_request(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def event_generator():
+        yield {"event": "session", "data": json.dumps({"session_id": session_id})}
+        async with aclosing(run_turn(user_id, session_id, message)) as turn:
+            async for event, agent_card in turn:
+                payload = serialize_event(event, agent_card)
+                yield {"event": payload["type"], "data": json.dumps(payload, ensure_ascii=False)}
+                if agent_card is None and event.is_final_response():
+                    break
+        yield {"event": "done", "data": "{}"}
+
+    return EventSourceResponse(event_generator())
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "sessions": SESSION_SERVICE.stats()})
+
+
+class RoutingAgentExecutor(AgentExecutor):
+    """Exposes the routing runner as an A2A agent, sharing the HTTP API's sessions."""
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue):
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        if not context.current_task:
+            updater.submit()
+        updater.start_work()
+        message = "".join(
+            part.root.text for part in context.message.parts if isinstance(part.root, TextPart)
+        )
+        streamed_artifacts: dict[str, str] = {}
+        try:
+            async with aclosing(run_turn(USER_ID, context.context_id, message)) as turn:
+                async for event, agent_card in turn:
+                    if agent_card is not None:
+                        progress_text = format_task_update(event, agent_card, streamed_artifacts)
+                        if progress_text:
+                            updater.update_status(
+                                TaskState.working,
+                                message=updater.new_agent_message([Part(root=TextPart(text=progress_text))]),
+                            )
+                    elif event.is_final_response():
+                        updater.add_artifact([Part(root=TextPart(text=final_response_text(event)))])
+                        updater.complete()
+                        return
+        except Exception as e:
+            # 不结束任务的话，A2A客户端会一直看到working状态
+            print(f"ERROR: Routing turn for task {context.task_id} failed: {e!r}")
+            updater.failed(
+                message=updater.new_agent_message([Part(root=TextPart(text=f"The routing agent failed: {e}"))])
+            )
+            return
+        updater.failed(
+            message=updater.new_agent_message(
+                [Part(root=TextPart(text="The routing agent ended without a final response"))]
+            )
+        )
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue):
+        raise ServerError(error=UnsupportedOperationError())
+
+
+def build_a2a_app(agent_url: str, task_store: TaskStore) -> Starlette:
+    agent_card = AgentCard(
+        name="Routing Agent",
+        description="Routes weather and postcode questions to the specialized remote agents",
+        url=agent_url,
+        version="1.0.0",
+        defaultInputModes=["text"],
+        defaultOutputModes=["text"],
+        capabilities=AgentCapabilities(streaming=True),
+        skills=[
+            AgentSkill(
+                id="routing",
+                name="Route to remote agents",
+                description="Answers questions by delegating to the weather and postcode agents",
+                tags=["weather", "postcode"],
+                examples=["北京的天气和邮编是什么?"],
+            )
+        ],
+    )
+    request_handler = DefaultRequestHandler(
+        agent_executor=RoutingAgentExecutor(), task_store=task_store
+    )
+    return A2AStarletteApplication(agent_card=agent_card, http_handler=request_handler).build()
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # 启动时完成远程Agent的发现，关闭时释放连接池
+    await get_runner()
+    yield
+    await close_root_agent()
+    if getattr(app.state, "task_store", None) is not None:
+        await app.state.task_store.close()
+
+
+def build_app(enable_a2a: bool = False, agent_url: str = "") -> Starlette:
+    routes = [
+        Route("/health", health, methods=["GET"]),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+    ]
+    task_store = None
+    if enable_a2a:
+        # 挂载的子应用不会运行自己的lifespan，由外层应用负责关闭任务存储
+        task_store = create_task_store()
+        routes.append(Mount("/a2a", app=build_a2a_app(agent_url, task_store)))
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.task_store = task_store
+    return app
+
+
+@click.command()
+@click.option("--host", "host", default="localhost", help="服务器绑定的主机名（默认为 localhost,可以指定具体本机ip）")
+@click.option("--port", "port", default=8084, help="服务器监听的端口号（默认为 8084）")
+@click.option("--a2a", "enable_a2a", is_flag=True, default=False, help="同时在 /a2a 下把路由Agent作为A2A服务对外提供")
+@click.option("--agent_url", "agent_url", default="", help="Agent Card中对外展示和访问的地址")
+def main(host, port, enable_a2a, agent_url=""):
+    agent_url = agent_url or f"http://{host}:{port}/a2a/"
+    uvicorn.run(build_app(enable_a2a, agent_url), host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,76 +15,66 @@ limitations under the License.
 """
 
 import gradio as gr
+from contextlib import aclosing
 from typing import List, AsyncIterator
-from adk_agent.agent import (
-    root_agent as routing_agent,
-)  
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.adk.events import Event
-from google.genai import types
+from adk_agent.agent import close_root_agent
+from runtime import USER_ID, final_response_text, format_task_update, get_runner, run_turn
 from pprint import pformat
 import asyncio
+import os
 import traceback  # Import the traceback module
 
-APP_NAME = "routing_app"
-USER_ID = "default_user"
-SESSION_ID = "default_session"
-
-SESSION_SERVICE = InMemorySessionService()
-ROUTING_AGENT_RUNNER = Runner(
-    agent=routing_agent,
-    app_name=APP_NAME,
-    session_service=SESSION_SERVICE,
-)
+# Gradio队列同时处理的对话轮数，不同浏览器会话之间并行执行
+CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "16"))
 
 
 async def get_response_from_agent(
     message: str,
     history: List[gr.ChatMessage],
+    request: gr.Request,
 ) -> AsyncIterator[gr.ChatMessage]:
     """Get response from host agent."""
+    # 每个浏览器会话对应一个独立的ADK会话
+    user_id = request.username or USER_ID
+    session_id = request.session_hash
     try:
-        events_iterator: AsyncIterator[Event] = ROUTING_AGENT_RUNNER.run_async(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=types.Content(role="user", parts=[types.Part(text=message)]),
-        )
+        # 远程Agent流式返回的artifact分片，按artifact id拼接
+        streamed_artifacts: dict[str, str] = {}
+        async with aclosing(run_turn(user_id, session_id, message)) as events:
+            async for event, agent_card in events:
+                if agent_card is not None:
+                    progress_text = format_task_update(event, agent_card, streamed_artifacts)
+                    if progress_text:
+                        yield gr.ChatMessage(role="assistant", content=progress_text)
+                    continue
 
-        async for event in events_iterator:
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.function_call:
-                        formatted_call = f"```python\n{pformat(part.function_call.model_dump(exclude_none=True), indent=2, width=80)}\n```"
-                        yield gr.ChatMessage(
-                            role="assistant",
-                            content=f"🛠️ **Tool Call: {part.function_call.name}**\n{formatted_call}",
-                        )
-                    elif part.function_response:
-                        response_content = part.function_response.response
-                        if (
-                            isinstance(response_content, dict)
-                            and "response" in response_content
-                        ):
-                            formatted_response_data = response_content["response"]
-                        else:
-                            formatted_response_data = response_content
-                        formatted_response = f"```json\n{pformat(formatted_response_data, indent=2, width=80)}\n```"
-                        yield gr.ChatMessage(
-                            role="assistant",
-                            content=f"⚡ **Tool Response from {part.function_response.name}**\n{formatted_response}",
-                        )
-            if event.is_final_response():
-                final_response_text = ""
                 if event.content and event.content.parts:
-                    final_response_text = "".join(
-                        [p.text for p in event.content.parts if p.text]
-                    )
-                elif event.actions and event.actions.escalate:
-                    final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-                if final_response_text:
-                    yield gr.ChatMessage(role="assistant", content=final_response_text)
-                break
+                    for part in event.content.parts:
+                        if part.function_call:
+                            formatted_call = f"```python\n{pformat(part.function_call.model_dump(exclude_none=True), indent=2, width=80)}\n```"
+                            yield gr.ChatMessage(
+                                role="assistant",
+                                content=f"🛠️ **Tool Call: {part.function_call.name}**\n{formatted_call}",
+                            )
+                        elif part.function_response:
+                            response_content = part.function_response.response
+                            if (
+                                isinstance(response_content, dict)
+                                and "response" in response_content
+                            ):
+                                formatted_response_data = response_content["response"]
+                            else:
+                                formatted_response_data = response_content
+                            formatted_response = f"```json\n{pformat(formatted_response_data, indent=2, width=80)}\n```"
+                            yield gr.ChatMessage(
+                                role="assistant",
+                                content=f"⚡ **Tool Response from {part.function_response.name}**\n{formatted_response}",
+                            )
+                if event.is_final_response():
+                    response_text = final_response_text(event)
+                    if response_text:
+                        yield gr.ChatMessage(role="assistant", content=response_text)
+                    break
     except Exception as e:
         print(f"Error in get_response_from_agent (Type: {type(e)}): {e}")
         traceback.print_exc()  # This will print the full traceback
@@ -96,11 +86,8 @@ async def get_response_from_agent(
 
 async def main():
     """Main gradio app."""
-    print("Creating ADK session...")
-    await SESSION_SERVICE.create_session(
-        app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID
-    )
-    print("ADK session created successfully.")
+    # 远程agent card的发现与界面构建并行进行，ADK会话在每个浏览器会话首次对话时创建
+    runner_task = asyncio.create_task(get_runner())
 
     with gr.Blocks(theme=gr.themes.Ocean(), title="A2A Host Agent with Logo") as demo:
         gr.Image(
@@ -119,11 +106,14 @@ async def main():
             description="This assistant can help you to check weather and find airbnb accommodation",
         )
 
+    await runner_task
+
     print("Launching Gradio interface...")
-    demo.queue().launch(
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT).launch(
         server_name="0.0.0.0",
         server_port=8083,
     )
+    await close_root_agent()
     print("Gradio application has been shut down.")
 
 if __name__ == "__main__":
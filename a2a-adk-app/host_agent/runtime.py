@@ -0,0 +1,151 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import weakref
+from typing import AsyncIterator
+
+from a2a.types import AgentCard, TaskArtifactUpdateEvent, TaskStatusUpdateEvent, TextPart
+from adk_agent.agent import get_root_agent
+from adk_agent.remote_agent_connection import TASK_UPDATE_QUEUE, TaskCallbackArg
+from adk_agent.session_service import BoundedSessionService
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.genai import types
+
+# Gradio界面与HTTP API共享的Runner和会话服务
+
+APP_NAME = "routing_app"
+USER_ID = "default_user"
+
+# 空闲过期和LRU淘汰的会话存储，长时间运行时内存不会无限增长
+SESSION_SERVICE = BoundedSessionService()
+# 保存被摘要或截断的远程Agent完整结果，供load_remote_result按需加载
+ARTIFACT_SERVICE = InMemoryArtifactService()
+# 每个ADK会话一把锁：同一会话的对话轮次串行执行，不同会话互不阻塞
+SESSION_LOCKS: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+_runner: Runner | None = None
+
+
+async def get_runner() -> Runner:
+    """Returns the shared routing Runner, initializing the root agent on first use."""
+    global _runner
+    root_agent = await get_root_agent()
+    if _runner is None:
+        _runner = Runner(
+            agent=root_agent,
+            app_name=APP_NAME,
+            session_service=SESSION_SERVICE,
+            artifact_service=ARTIFACT_SERVICE,
+        )
+    return _runner
+
+
+async def ensure_session(user_id: str, session_id: str) -> None:
+    """Create the ADK session on first use."""
+    session = await SESSION_SERVICE.get_session(
+        app_name=APP_NAME, user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        await SESSION_SERVICE.create_session(
+            app_name=APP_NAME, user_id=user_id, session_id=session_id
+        )
+        print(f"ADK session {session_id} created for user {user_id}.")
+
+
+async def run_turn(
+    user_id: str, session_id: str, message: str
+) -> AsyncIterator[tuple[Event | TaskCallbackArg, AgentCard | None]]:
+    """Run one user turn and yield events as they arrive.
+
+    Yields (event, None) for ADK events of the routing agent and
+    (event, agent_card) for streaming progress relayed from a remote agent.
+    """
+    runner = await get_runner()
+    # 远程Agent的流式事件和本地ADK事件汇入同一个队列，这样在工具调用期间也能提前展示部分结果
+    queue: asyncio.Queue = asyncio.Queue()
+    TASK_UPDATE_QUEUE.set(queue)
+
+    async def pump_events():
+        try:
+            session_lock = SESSION_LOCKS.setdefault(session_id, asyncio.Lock())
+            async with session_lock:
+                await ensure_session(user_id, session_id)
+                events_iterator: AsyncIterator[Event] = runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+                )
+                async for event in events_iterator:
+                    await queue.put((event, None))
+        finally:
+            await queue.put((None, None))
+
+    pump_task = asyncio.create_task(pump_events())
+    try:
+        while True:
+            event, agent_card = await queue.get()
+            if event is None:
+                # 抛出后台任务中的异常
+                await pump_task
+                return
+            yield event, agent_card
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+
+
+def format_task_update(event, agent_card, artifacts: dict[str, str] | None = None) -> str:
+    """Render a remote TaskStatusUpdateEvent/TaskArtifactUpdateEvent as text.
+
+    When artifacts is given, streamed artifact chunks are accumulated in it
+    by artifact id and the text received so far is rendered.
+    """
+    if isinstance(event, TaskArtifactUpdateEvent):
+        parts = event.artifact.parts
+    elif isinstance(event, TaskStatusUpdateEvent) and event.status.message:
+        parts = event.status.message.parts
+    else:
+        return ""
+    text = "".join(part.root.text for part in parts if isinstance(part.root, TextPart))
+    if isinstance(event, TaskArtifactUpdateEvent) and artifacts is not None:
+        artifact_id = event.artifact.artifactId
+        if event.append:
+            text = artifacts.get(artifact_id, "") + text
+        artifacts[artifact_id] = text
+    if not text:
+        return ""
+    return f"⏳ **{agent_card.name}**\n{text}"
+
+
+def final_response_text(event: Event) -> str:
+    """Text of a final ADK response event."""
+    if event.content and event.content.parts:
+        text = "".join([p.text for p in event.content.parts if p.text])
+        if text:
+            return text
+        # 直通模式下最终事件是工具结果本身，取出远程Agent返回的文本部分
+        return "".join(
+            part.get("text", "")
+            for response in event.get_function_responses()
+            for part in (response.response or {}).get("result") or []
+            if isinstance(part, dict)
+        )
+    if event.actions and event.actions.escalate:
+        return f"Agent escalated: {event.error_message or 'No specific message.'}"
+    return ""
@@ -0,0 +1,352 @@
+import asyncio
+
+import httpx
+import pytest
+from a2a.client import A2AClientHTTPError
+from a2a.types import AgentCapabilities, AgentCard
+
+from adk_agent import resilience
+from adk_agent.remote_agent_connection import RemoteAgentConnections
+from adk_agent.resilience import AgentUnavailableError, CircuitBreaker, RetryBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setenv("A2A_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("A2A_BREAKER_RESET_TIMEOUT", "10")
+    return CircuitBreaker()
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_trial_success_closes(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 试探期间只放行一个请求
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_half_open_trial_failure_reopens(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_abort_ends_half_open_trial(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    breaker.record_abort()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 11
+    assert breaker.allow()
+
+
+def test_breaker_abort_is_ignored_when_closed(breaker):
+    breaker.record_failure()
+    breaker.record_abort()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker2 = CircuitBreaker()
+    breaker2.record_abort()
+    assert breaker2.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_replaces_stuck_trial(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    clock.now += 11
+    assert breaker.allow()
+
+
+def test_retry_budget(monkeypatch):
+    monkeypatch.setenv("A2A_RETRY_RATIO", "0.5")
+    monkeypatch.setenv("A2A_RETRY_BURST", "2")
+    budget = RetryBudget()
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    for _ in range(10):
+        budget.deposit()
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    monkeypatch.setenv("A2A_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("A2A_BREAKER_RESET_TIMEOUT", "10")
+    monkeypatch.setenv("A2A_RETRY_BURST", "1")
+    monkeypatch.setenv("A2A_TIMEOUT", "0.2")
+    monkeypatch.setenv("A2A_STREAM_IDLE_TIMEOUT", "0.2")
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr("adk_agent.remote_agent_connection.backoff_delay", lambda attempt: 0)
+    card = AgentCard(
+        name="Test Agent",
+        description="",
+        url="http://test/",
+        version="1.0.0",
+        defaultInputModes=["text"],
+        defaultOutputModes=["text"],
+        capabilities=AgentCapabilities(streaming=True),
+        skills=[],
+    )
+    return RemoteAgentConnections(card, "http://test/")
+
+
+def connect_error() -> A2AClientHTTPError:
+    error = A2AClientHTTPError(503, "Network communication error")
+    error.__cause__ = httpx.ConnectError("refused")
+    return error
+
+
+def test_call_returns_result_and_records_latency(connection):
+    async def make_call():
+        return "ok"
+
+    assert asyncio.run(connection._call(make_call, connection.send_latency, idempotent=False)) == "ok"
+    assert connection.send_latency.percentile(50) is not None
+    assert connection.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_poll_latency_does_not_shorten_send_timeout(connection):
+    async def fast_call():
+        return "ok"
+
+    for _ in range(25):
+        asyncio.run(connection._call(fast_call, connection.get_latency, idempotent=True))
+    assert connection.get_latency.percentile(50) is not None
+    # 没有发送样本时仍使用静态超时
+    assert connection.send_latency.percentile(50) is None
+
+
+def test_call_retries_connect_errors_within_budget(connection):
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise connect_error()
+        return "ok"
+
+    assert asyncio.run(connection._call(make_call, connection.send_latency, idempotent=False)) == "ok"
+    assert len(calls) == 2
+
+
+def test_call_does_not_retry_non_idempotent_timeouts(connection):
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(connection._call(make_call, connection.send_latency, idempotent=False))
+    assert len(calls) == 1
+
+
+def test_call_client_error_does_not_trip_breaker(connection):
+    async def make_call():
+        raise A2AClientHTTPError(400, "bad request")
+
+    for _ in range(3):
+        with pytest.raises(A2AClientHTTPError):
+            asyncio.run(connection._call(make_call, connection.send_latency, idempotent=True))
+    assert connection.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_fails_fast_when_breaker_open(connection):
+    async def failing_call():
+        raise A2AClientHTTPError(500, "error")
+
+    for _ in range(2):
+        with pytest.raises(A2AClientHTTPError):
+            asyncio.run(connection._call(failing_call, connection.send_latency, idempotent=False))
+    with pytest.raises(AgentUnavailableError):
+        asyncio.run(connection._call(failing_call, connection.send_latency, idempotent=False))
+
+
+def test_call_unexpected_error_ends_half_open_trial(connection, clock):
+    connection.breaker.record_failure()
+    connection.breaker.record_failure()
+    clock.now += 11
+
+    async def make_call():
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        asyncio.run(connection._call(make_call, connection.send_latency, idempotent=False))
+    assert connection.breaker.state == CircuitBreaker.OPEN
+
+
+class FakeStreamClient:
+    def __init__(self, events, delay=0.0):
+        self.events = events
+        self.delay = delay
+
+    async def send_message_streaming(self, request):
+        for event in self.events:
+            await asyncio.sleep(self.delay)
+            yield event
+
+
+def streaming_request():
+    from a2a.types import MessageSendParams, SendStreamingMessageRequest
+
+    return SendStreamingMessageRequest(
+        id="1",
+        params=MessageSendParams.model_validate(
+            {"message": {"role": "user", "parts": [{"kind": "text", "text": "hi"}], "messageId": "m1"}}
+        ),
+    )
+
+
+def status_event(final: bool):
+    from a2a.types import SendStreamingMessageResponse
+
+    return SendStreamingMessageResponse.model_validate(
+        {
+            "jsonrpc": "2.0",
+            "id": "1",
+            "result": {
+                "kind": "status-update",
+                "taskId": "t1",
+                "contextId": "c1",
+                "final": final,
+                "status": {"state": "completed" if final else "working"},
+            },
+        }
+    )
+
+
+def test_streaming_success_recorded_when_consumer_stops_at_final(connection, clock, monkeypatch):
+    monkeypatch.setattr(
+        connection, "_client_for", lambda url: FakeStreamClient([status_event(False), status_event(True)])
+    )
+    connection.breaker.record_failure()
+    connection.breaker.record_failure()
+    clock.now += 11
+
+    async def consume():
+        stream = connection.send_message_streaming(streaming_request())
+        async for response in stream:
+            if response.root.result.final:
+                break
+        await stream.aclose()
+
+    asyncio.run(consume())
+    assert connection.breaker.state == CircuitBreaker.CLOSED
+    assert connection.breaker.allow()
+
+
+def test_streaming_idle_timeout(connection, monkeypatch):
+    monkeypatch.setattr(
+        connection, "_client_for", lambda url: FakeStreamClient([status_event(True)], delay=1)
+    )
+
+    async def consume():
+        async for _ in connection.send_message_streaming(streaming_request()):
+            pass
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(consume())
+    assert connection.breaker._failures == 1
+
+
+class FakeSendClient:
+    def __init__(self, state):
+        self.state = state
+
+    async def send_message(self, request):
+        from a2a.types import SendMessageResponse
+
+        return SendMessageResponse.model_validate(
+            {
+                "jsonrpc": "2.0",
+                "id": request.id,
+                "result": {
+                    "kind": "task",
+                    "id": f"task-{self.state}",
+                    "contextId": "c1",
+                    "status": {"state": self.state},
+                },
+            }
+        )
+
+
+def send_request():
+    from a2a.types import SendMessageRequest
+
+    return SendMessageRequest(id="1", params=streaming_request().params)
+
+
+@pytest.mark.parametrize(
+    ("state", "track_task", "tracked"),
+    [("working", True, True), ("completed", True, False), ("working", False, False)],
+)
+def test_send_message_tracks_only_unfinished_tracked_tasks(connection, monkeypatch, state, track_task, tracked):
+    monkeypatch.setattr(connection, "_client_for", lambda url: FakeSendClient(state))
+    asyncio.run(connection.send_message(send_request(), track_task=track_task))
+    assert (f"task-{state}" in connection._task_replicas) == tracked
+    connection.forget_task(f"task-{state}")
+    assert not connection._task_replicas
+
+
+def test_streaming_closed_early_records_success_and_tracks_task(connection, clock, monkeypatch):
+    monkeypatch.setattr(
+        connection, "_client_for", lambda url: FakeStreamClient([status_event(False), status_event(True)])
+    )
+    connection.breaker.record_failure()
+    connection.breaker.record_failure()
+    clock.now += 11
+
+    async def consume_first():
+        stream = connection.send_message_streaming(streaming_request(), track_task=True)
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(consume_first())
+    assert connection.breaker.state == CircuitBreaker.CLOSED
+    assert connection._task_replicas == {"t1": "http://test/"}
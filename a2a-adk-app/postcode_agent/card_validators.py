@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : card_validators.py
+# @Desc  : 为 agent card 添加 ETag/Last-Modified，客户端重新验证时只需返回 304
+import hashlib
+import time
+from email.utils import formatdate
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from a2a.types import AgentCard
+
+
+class _AgentCardValidatorsMiddleware:
+    """
+    纯 ASGI 中间件，只处理 agent card 路由，其余请求原样交给应用，不影响流式响应
+    """
+
+    def __init__(self, app: ASGIApp, agent_card_path: str, validators: dict[str, str]):
+        self.app = app
+        self.agent_card_path = agent_card_path
+        self.validators = validators
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] != self.agent_card_path
+            or scope["method"] not in ("GET", "HEAD")
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = if_none_match == self.validators["ETag"]
+        else:
+            not_modified = headers.get("if-modified-since") == self.validators["Last-Modified"]
+        if not_modified:
+            await Response(status_code=304, headers=self.validators)(scope, receive, send)
+            return
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(self.validators)
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+
+def add_agent_card_validators(
+    app: Starlette,
+    agent_card: AgentCard,
+    agent_card_path: str = "/.well-known/agent.json",
+    max_age: int = 300,
+) -> None:
+    """
+    给 agent card 路由加上缓存验证头，并处理 If-None-Match / If-Modified-Since 条件请求
+    :param app: A2AStarletteApplication.build() 得到的应用
+    :param agent_card: 对外提供的 agent card，内容在进程生命周期内不变
+    :param agent_card_path: agent card 的路由
+    :param max_age: Cache-Control 的 max-age，单位秒
+    """
+    card_json = agent_card.model_dump_json(exclude_none=True)
+    validators = {
+        "ETag": f'"{hashlib.sha256(card_json.encode("utf-8")).hexdigest()[:32]}"',
+        "Last-Modified": formatdate(time.time(), usegmt=True),
+        "Cache-Control": f"max-age={max_age}",
+    }
+
+    app.add_middleware(
+        _AgentCardValidatorsMiddleware, agent_card_path=agent_card_path, validators=validators
+    )
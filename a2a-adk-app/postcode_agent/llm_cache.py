@@ -0,0 +1,156 @@
+"""
+Opt-in on-disk cache of LLM responses, hooked into ADK model callbacks.
+
+Responses are keyed by a hash of the model name, system instruction, tool
+declarations and conversation contents, stored in a size-bounded SQLite
+file with a TTL, and replayed from `before_model_callback`, which skips
+the provider call entirely. SQLite runs in a worker thread so model calls
+of other sessions are not blocked.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+
+class LlmResponseCache:
+    """A bounded SQLite store of LlmResponses with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+    ):
+        self.path = path or os.getenv(
+            "LLM_RESPONSE_CACHE_PATH",
+            os.path.join(os.path.expanduser("~"), ".cache", "adk_llm_cache.sqlite3"),
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_RESPONSE_CACHE_TTL", "86400"))
+        self.max_entries = max_entries or int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "10000"))
+        self.prune_interval = float(os.getenv("LLM_RESPONSE_CACHE_PRUNE_INTERVAL", "300"))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, created_at REAL, accessed_at REAL, response TEXT)"
+        )
+        self._conn.commit()
+        # invocation_id -> 当前模型请求的缓存key，在after_model_callback中写入响应；
+        # 模型调用出错时不会有after_model_callback，因此限制数量，最早的先丢弃
+        self._pending_keys: OrderedDict[str, str] = OrderedDict()
+        self.max_pending = 1024
+        self._lock = asyncio.Lock()
+        self._last_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def request_key(llm_request: LlmRequest) -> str:
+        config = llm_request.config
+        payload = {
+            "model": llm_request.model,
+            "system_instruction": str(config.system_instruction) if config else None,
+            "tools": [
+                tool.model_dump(mode="json", exclude_none=True) for tool in (config.tools or [])
+            ] if config else [],
+            "contents": [
+                content.model_dump(mode="json", exclude_none=True)
+                for content in llm_request.contents
+            ],
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    async def get(self, key: str) -> LlmResponse | None:
+        async with self._lock:
+            row = await asyncio.to_thread(self._select, key, time.time())
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return LlmResponse.model_validate_json(row)
+
+    async def put(self, key: str, llm_response: LlmResponse) -> None:
+        data = llm_response.model_dump_json(exclude_none=True)
+        now = time.time()
+        # 过期和超量的条目定期清理，不必每次写入都扫描整张表
+        prune = now - self._last_prune >= self.prune_interval
+        if prune:
+            self._last_prune = now
+        async with self._lock:
+            await asyncio.to_thread(self._insert, key, data, now, prune)
+
+    def _select(self, key: str, now: float) -> str | None:
+        row = self._conn.execute(
+            "SELECT created_at, response FROM llm_responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[0] > self.ttl:
+            return None
+        with self._conn:
+            self._conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[1]
+
+    def _insert(self, key: str, data: str, now: float, prune: bool) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)", (key, now, now, data)
+            )
+            if prune:
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,)
+                )
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    async def before_model_callback(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> LlmResponse | None:
+        key = self.request_key(llm_request)
+        cached = await self.get(key)
+        if cached is not None:
+            print(f"LLM response cache hit: {self.stats()}")
+            return cached
+        self._pending_keys[callback_context.invocation_id] = key
+        self._pending_keys.move_to_end(callback_context.invocation_id)
+        while len(self._pending_keys) > self.max_pending:
+            self._pending_keys.popitem(last=False)
+        return None
+
+    async def after_model_callback(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> LlmResponse | None:
+        # 流式输出的分片不缓存，只缓存最终的完整响应
+        if llm_response.partial:
+            return None
+        key = self._pending_keys.pop(callback_context.invocation_id, None)
+        if key and llm_response.content and not llm_response.error_code:
+            await self.put(key, llm_response)
+        return None
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def create_llm_response_cache() -> LlmResponseCache | None:
+    """Returns a cache when LLM_RESPONSE_CACHE is enabled, otherwise None."""
+    if os.getenv("LLM_RESPONSE_CACHE", "false").lower() != "true":
+        return None
+    return LlmResponseCache()
@@ -42,6 +42,8 @@ def load_mcp_tools(mcp_config_path):
     assert os.path.exists(mcp_config_path),  f"{mcp_config_path}配置文件不存在，请检查"
     config = load_mcp_config_from_file(mcp_config_path)
     servers_cfg = config.get("mcpServers", {})
+    # 工具调用的超时时间，可以在每个server的配置中用timeout单独指定
+    default_timeout = float(os.getenv("MCP_TOOL_TIMEOUT", "60"))
     mcp_tools = []
     for server_name, conf in servers_cfg.items():
         if "url" in conf:  # SSE server
@@ -49,13 +51,13 @@ def load_mcp_tools(mcp_config_path):
                 connection_params=SseConnectionParams(
                     # 工具的调用延迟,最大30秒， MCP初始化延迟，最大5秒
                     url = conf["url"],
-                    timeout=60
+                    timeout=conf.get("timeout", default_timeout)
                 )
             )
         elif "command" in conf:  # Local process-based server
             client = MCPToolset(
                 connection_params=StdioConnectionParams(
-                    timeout=60,
+                    timeout=conf.get("timeout", default_timeout),
                     server_params=StdioServerParameters(
                         command=conf.get("command"),
                         args=conf.get("args", []),
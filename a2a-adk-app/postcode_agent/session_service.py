@@ -0,0 +1,139 @@
+"""
+A bounded in-memory ADK session service for long-running servers.
+
+Sessions idle for longer than SESSION_TTL seconds are removed by a
+background sweeper, and the least recently used sessions are evicted once
+SESSION_MAX_COUNT sessions or roughly SESSION_MAX_BYTES of session data are
+held, so memory stays bounded without restarting the process. The size
+gauges are logged at INFO after every sweep.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+
+logger = logging.getLogger(__name__)
+# 每次清理后记录会话数量和大小，根日志级别默认为WARNING时也要能看到
+logger.setLevel(logging.INFO)
+
+SessionKey = tuple[str, str, str]
+
+
+class BoundedSessionService(InMemorySessionService):
+    """InMemorySessionService with idle TTL, LRU eviction and size gauges."""
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        max_sessions: int | None = None,
+        max_bytes: int | None = None,
+        sweep_interval: float | None = None,
+    ):
+        super().__init__()
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_TTL", "3600"))
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_COUNT", "10000"))
+        self.max_bytes = max_bytes or int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.sweep_interval = sweep_interval or float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+        # (app_name, user_id, session_id) -> [最近访问时间, 估算的字节数]，按访问顺序排列
+        self._usage: OrderedDict[SessionKey, list[float]] = OrderedDict()
+        self.live_bytes = 0
+        self.evictions = 0
+        self._eviction_listeners: list[Callable[[str], None]] = []
+        self._sweeper: asyncio.Task | None = None
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a callback invoked with the id of every evicted session."""
+        self._eviction_listeners.append(listener)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._touch((app_name, user_id, session.id), len(session.model_dump_json()))
+        await self._enforce_limits()
+        self._ensure_sweeper()
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None):
+        key = (app_name, user_id, session_id)
+        usage = self._usage.get(key)
+        if usage is not None and time.monotonic() - usage[0] > self.ttl:
+            await self._evict(key)
+            return None
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            self._touch(key, 0)
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._forget((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if not event.partial:
+            self._touch((session.app_name, session.user_id, session.id), len(event.model_dump_json()))
+            await self._enforce_limits()
+        return event
+
+    def stats(self) -> dict[str, int]:
+        """Gauges of the live sessions and their approximate size."""
+        return {
+            "live_sessions": len(self._usage),
+            "live_bytes": int(self.live_bytes),
+            "evictions": self.evictions,
+        }
+
+    def _touch(self, key: SessionKey, added_bytes: int) -> None:
+        usage = self._usage.setdefault(key, [0.0, 0])
+        usage[0] = time.monotonic()
+        usage[1] += added_bytes
+        self.live_bytes += added_bytes
+        self._usage.move_to_end(key)
+
+    def _forget(self, key: SessionKey) -> None:
+        usage = self._usage.pop(key, None)
+        if usage is not None:
+            self.live_bytes -= usage[1]
+
+    async def _evict(self, key: SessionKey) -> None:
+        app_name, user_id, session_id = key
+        await self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self.evictions += 1
+        for listener in self._eviction_listeners:
+            listener(session_id)
+
+    async def _enforce_limits(self) -> None:
+        # 保留最近使用的一个会话，避免正在运行的会话被自己挤掉
+        while len(self._usage) > 1 and (
+            len(self._usage) > self.max_sessions or self.live_bytes > self.max_bytes
+        ):
+            await self._evict(next(iter(self._usage)))
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            deadline = time.monotonic() - self.ttl
+            expired = [key for key, usage in self._usage.items() if usage[0] < deadline]
+            for key in expired:
+                await self._evict(key)
+            logger.info("Evicted %d idle sessions, session stats: %s", len(expired), self.stats())
@@ -7,15 +7,14 @@ import uvicorn
 from adk_agent import create_agent
 from adk_agent_executor import ADKAgentExecutor
 from dotenv import load_dotenv
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.artifacts import InMemoryArtifactService
 from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from starlette.routing import Route
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
@@ -23,6 +22,9 @@ from a2a.types import (
 )
 from starlette.applications import Starlette
 from load_mcp import load_mcp_tools
+from card_validators import add_agent_card_validators
+from session_service import BoundedSessionService
+from task_store import create_task_store
 
 
 load_dotenv()
@@ -38,7 +40,8 @@ logging.basicConfig()
 @click.option("--provider", "provider", default="deepseek", type=click.Choice(["google","openai", "deepseek", "ali"]),help="模型提供方名称（如 deepseek、openai 等）")
 @click.option("--mcp_config", "mcp_config_path", default="mcp_config.json",help="MCP 配置文件路径（默认为 mcp_config.json）")
 @click.option("--agent_url", "agent_url", default="",help="Agent Card中对外展示和访问的地址")
-def main(host, port, agent_prompt_file, model_name, provider, mcp_config_path, agent_url=""):
+@click.option("--streaming", "streaming", is_flag=True, default=False, help="模型输出逐段以artifact分片的形式流式返回")
+def main(host, port, agent_prompt_file, model_name, provider, mcp_config_path, agent_url="", streaming=False):
     agent_card_name = "Weather Agent"
     agent_name = "weather_agent"
     agent_description = "An agent that can help questions about weather"
@@ -68,20 +71,28 @@ def main(host, port, agent_prompt_file, model_name, provider, mcp_config_path, a
         app_name=agent_card.name,
         agent=adk_agent,
         artifact_service=InMemoryArtifactService(),
-        session_service=InMemorySessionService(),
+        # 空闲过期和LRU淘汰的会话存储，长时间运行时内存不会无限增长
+        session_service=BoundedSessionService(),
         memory_service=InMemoryMemoryService(),
     )
-    agent_executor = ADKAgentExecutor(runner, agent_card)
+    # 支持流式的SSE模式的输出
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE)
+    agent_executor = ADKAgentExecutor(runner, agent_card, run_config)
 
+    # 已结束的任务按TTL清理并限制历史长度，可选SQLite持久化
+    task_store = create_task_store()
     request_handler = DefaultRequestHandler(
-        agent_executor=agent_executor, task_store=InMemoryTaskStore()
+        agent_executor=agent_executor, task_store=task_store
     )
 
     a2a_app = A2AStarletteApplication(
         agent_card=agent_card, http_handler=request_handler
     )
 
-    uvicorn.run(a2a_app.build(), host=host, port=port)
+    app = a2a_app.build(lifespan=task_store.lifespan)
+    # agent card 带上 ETag/Last-Modified，客户端缓存重新验证时只返回 304
+    add_agent_card_validators(app, agent_card)
+    uvicorn.run(app, host=host, port=port)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ import logging
 import os
 from google.adk.agents import LlmAgent
 from google.adk.models.lite_llm import LiteLlm
+from llm_cache import create_llm_response_cache
 
 def create_model(model:str, provider: str):
     """
@@ -41,10 +42,14 @@ def create_agent(model, provider, agent_name,agent_description,agent_instruction
     """Constructs the ADK agent."""
     logging.info(f"使用的模型供应商是: {provider}，模型是: {model}")
     model = create_model(model, provider)
+    # 可选的本地LLM响应缓存，通过环境变量LLM_RESPONSE_CACHE=true开启
+    llm_cache = create_llm_response_cache()
     return LlmAgent(
         model=model,
         name=agent_name,
         description=agent_description,
         instruction=agent_instruction,
         tools=mcptools,
+        before_model_callback=llm_cache.before_model_callback if llm_cache else None,
+        after_model_callback=llm_cache.after_model_callback if llm_cache else None,
     )
@@ -0,0 +1,91 @@
+"""
+On-disk cache for remote agent cards.
+
+Cards are keyed by the agent URL. A cached card younger than the TTL is
+returned without any network I/O; an older one is revalidated with
+If-None-Match / If-Modified-Since so an unchanged card only costs a 304.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import httpx
+
+from a2a.types import AgentCard
+
+AGENT_CARD_PATH = "/.well-known/agent.json"
+
+
+class AgentCardCache:
+    """A persistent agent card cache with TTL and conditional revalidation."""
+
+    def __init__(self, cache_dir: str | None = None, ttl: float | None = None):
+        self.cache_dir = cache_dir or os.getenv(
+            "AGENT_CARD_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "a2a_agent_cards"),
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("AGENT_CARD_CACHE_TTL", "300"))
+
+    def _path(self, card_url: str) -> str:
+        key = hashlib.sha256(card_url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, card_url: str) -> dict | None:
+        try:
+            with open(self._path(card_url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, card_url: str, entry: dict) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(card_url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    async def get_agent_card(
+        self,
+        httpx_client: httpx.AsyncClient,
+        base_url: str,
+        agent_card_path: str = AGENT_CARD_PATH,
+        revalidate: bool = False,
+    ) -> AgentCard:
+        """Returns the agent card for base_url, using the cache when possible.
+
+        With revalidate=True the TTL is ignored and the server is always
+        asked, which still only costs a 304 when the card is unchanged.
+        """
+        card_url = f"{base_url.rstrip('/')}/{agent_card_path.lstrip('/')}"
+        entry = self._load(card_url)
+        if entry and not revalidate and time.time() - entry["fetched_at"] < self.ttl:
+            return AgentCard.model_validate(entry["card"])
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        response = await httpx_client.get(card_url, headers=headers)
+
+        if response.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+            self._save(card_url, entry)
+            return AgentCard.model_validate(entry["card"])
+
+        response.raise_for_status()
+        card_data = response.json()
+        card = AgentCard.model_validate(card_data)
+        self._save(
+            card_url,
+            {
+                "card": card_data,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            },
+        )
+        return card
@@ -8,7 +8,8 @@ from uuid import uuid4
 
 import asyncclick as click
 
-from a2a.client import A2AClient, A2ACardResolver
+from a2a.client import A2AClient
+from card_cache import AgentCardCache
 from a2a.types import (
     Part,
     TextPart,
@@ -47,8 +48,7 @@ async def cli(
     headers = {h.split("=")[0]: h.split("=")[1] for h in header}
     print(f"Will use headers: {headers}")
     async with httpx.AsyncClient(timeout=30, headers=headers) as httpx_client:
-        card_resolver = A2ACardResolver(httpx_client, agent)
-        card = await card_resolver.get_agent_card()
+        card = await AgentCardCache().get_agent_card(httpx_client, agent)
 
         print("======= Agent Card ========")
         print(card.model_dump_json(exclude_none=True))